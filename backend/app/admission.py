@@ -0,0 +1,267 @@
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from . import config
+
+# Admission control: sheds load before it reaches the routers, so overload
+# degrades into 429 responses instead of exhausted threads and memory.
+#
+#   Public link reads     token buckets per client IP and per public link
+#   Uploads               a token bucket per client IP, then a global gate on
+#                         uploads in flight and their bytes (by Content-Length)
+#                         that queues up to UPLOADS_MAX_QUEUED requests for at
+#                         most UPLOADS_QUEUE_TIMEOUT seconds
+#
+# Limits are per process. The client IP is the ASGI client address; run
+# uvicorn with --proxy-headers behind a trusted proxy so it is the real one.
+
+PUBLIC_READ = re.compile(r"^/checklists/public/([^/]+)")
+UPLOAD = re.compile(r"^/(items/\d+/uploads/(batch)?|checklists/\d+/uploads/batch)$")
+# Templates of the routes guarded above. A refused request never reaches the
+# router, so it is labelled with one of these in its metrics (through
+# scope["refused_route"]), or with "admission" if its path matches no route.
+GUARDED_ROUTES = [
+    (re.compile(pattern), template) for pattern, template in (
+        (r"^/checklists/public/[^/]+$", "/checklists/public/{public_link}"),
+        (r"^/checklists/public/[^/]+/events$", "/checklists/public/{public_link}/events"),
+        (r"^/items/\d+/uploads/$", "/items/{item_id}/uploads/"),
+        (r"^/items/\d+/uploads/batch$", "/items/{item_id}/uploads/batch"),
+        (r"^/checklists/\d+/uploads/batch$", "/checklists/{checklist_id}/uploads/batch"),
+    )
+]
+# Bytes charged for an upload without a Content-Length: the single-file limit
+UNKNOWN_UPLOAD_BYTES = 10 * 1024 * 1024
+
+RATE_LIMITED = "Too many requests. Please retry later."
+UPLOADS_BUSY = "Too many uploads in progress. Please retry later."
+
+
+class RateLimiter:
+    """Token buckets per key: `rate` requests per second on average, bursts of up to `burst`
+
+    Only the max_keys most recently seen keys are tracked; a forgotten key
+    starts again with a full bucket. Not thread-safe; use on the event loop.
+    """
+
+    def __init__(self, rate: int, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (tokens, last refill)
+
+    def acquire(self, key: str) -> float:
+        """Take a token for key: 0 if one was available, otherwise the seconds until one will be"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class UploadGate:
+    """Bounds the uploads in flight and their total bytes, queueing the excess in arrival order
+
+    An upload larger than max_bytes on its own is let through once nothing
+    else is in flight, so it is never starved. A limit of 0 means unlimited.
+    """
+
+    def __init__(self, max_concurrent: int, max_bytes: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_bytes = max_bytes
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self.bytes = 0
+        self._waiters = deque()  # (future, size)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _fits(self, size: int) -> bool:
+        if self.in_flight == 0:
+            return True
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            return False
+        return not self.max_bytes or self.bytes + size <= self.max_bytes
+
+    def is_full(self, size: int) -> bool:
+        """Whether an upload of size bytes would have to wait"""
+        return bool(self._waiters) or not self._fits(size)
+
+    def _take(self, size: int):
+        self.in_flight += 1
+        self.bytes += size
+
+    async def acquire(self, size: int, timeout: float) -> bool:
+        """Wait up to timeout seconds for room for an upload of size bytes; False if there was none"""
+        if not self.is_full(size):
+            self._take(size)
+            return True
+        if len(self._waiters) >= self.max_queued or timeout <= 0:
+            return False
+        waiter = (asyncio.get_running_loop().create_future(), size)
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[0], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # Admitted just as the client went away: hand the room back
+            if waiter[0].done() and not waiter[0].cancelled():
+                self.release(size)
+            raise
+        finally:
+            if waiter in self._waiters:
+                # Gave up at the head of the queue: those behind may fit now
+                self._waiters.remove(waiter)
+                self._admit_waiting()
+
+    def release(self, size: int):
+        """Free an upload's room and admit whoever waits next"""
+        self.in_flight -= 1
+        self.bytes -= size
+        self._admit_waiting()
+
+    def _admit_waiting(self):
+        """Admit queued uploads in arrival order for as long as the next one fits"""
+        while self._waiters:
+            future, waiting_size = self._waiters[0]
+            if future.done():  # Timed out or cancelled
+                self._waiters.popleft()
+                continue
+            if not self._fits(waiting_size):
+                break
+            self._waiters.popleft()
+            self._take(waiting_size)
+            future.set_result(None)
+
+
+class Admission:
+    """The limits applied by AdmissionMiddleware, with counts of what they turned away"""
+
+    def __init__(self):
+        self.public_link_rate = RateLimiter(
+            config.PUBLIC_LINK_RATE, config.PUBLIC_LINK_BURST, config.RATE_LIMIT_MAX_KEYS
+        )
+        self.public_client_rate = RateLimiter(
+            config.PUBLIC_CLIENT_RATE, config.PUBLIC_CLIENT_BURST, config.RATE_LIMIT_MAX_KEYS
+        )
+        self.upload_client_rate = RateLimiter(
+            config.UPLOAD_CLIENT_RATE, config.UPLOAD_CLIENT_BURST, config.RATE_LIMIT_MAX_KEYS
+        )
+        self.uploads = UploadGate(
+            config.UPLOADS_MAX_CONCURRENT, config.UPLOADS_MAX_INFLIGHT_BYTES, config.UPLOADS_MAX_QUEUED
+        )
+        self.rejected: Dict[str, int] = {
+            "public_link_rate": 0, "public_client_rate": 0, "upload_client_rate": 0, "upload_capacity": 0
+        }
+        self.queued = 0  # Uploads that had to wait for room, admitted or not
+
+
+def _client(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    Rate limits public link reads and uploads, and caps uploads in flight.
+
+    Refused requests get a 429 with a Retry-After header, without touching
+    the database or reading their body. Plain ASGI, like the other middleware.
+    """
+
+    def __init__(self, app, admission: Optional[Admission] = None):
+        self.app = app
+        self.admission = admission or controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        if method in ("GET", "HEAD"):
+            match = PUBLIC_READ.match(path)
+            if match is not None:
+                wait = self._limit(self.admission.public_client_rate, _client(scope), "public_client_rate")
+                if not wait:
+                    wait = self._limit(self.admission.public_link_rate, match.group(1), "public_link_rate")
+                if wait:
+                    await self._refuse(scope, receive, send, RATE_LIMITED, wait)
+                    return
+        elif method == "POST" and UPLOAD.match(path):
+            wait = self._limit(self.admission.upload_client_rate, _client(scope), "upload_client_rate")
+            if wait:
+                await self._refuse(scope, receive, send, RATE_LIMITED, wait)
+                return
+            await self._upload(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    def _limit(self, limiter: RateLimiter, key: str, reason: str) -> float:
+        wait = limiter.acquire(key)
+        if wait:
+            self.admission.rejected[reason] += 1
+        return wait
+
+    async def _upload(self, scope, receive, send):
+        gate = self.admission.uploads
+        size = _content_length(scope)
+        size = UNKNOWN_UPLOAD_BYTES if size is None else size
+        if gate.is_full(size):
+            self.admission.queued += 1
+        if not await gate.acquire(size, config.UPLOADS_QUEUE_TIMEOUT):
+            self.admission.rejected["upload_capacity"] += 1
+            await self._refuse(scope, receive, send, UPLOADS_BUSY, max(config.UPLOADS_QUEUE_TIMEOUT, 1))
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(size)
+
+    async def _refuse(self, scope, receive, send, detail: str, retry_after: float):
+        scope["refused_route"] = next(
+            (template for pattern, template in GUARDED_ROUTES if pattern.match(scope["path"])), "admission"
+        )
+        response = JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": detail},
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+        await response(scope, receive, send)
+
+
+# The application's admission controller
+controller = Admission()
@@ -1,83 +1,246 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
 from typing import List, Optional
+import base64
+import binascii
+import datetime
 
-from .. import crud, schemas, database
+from .. import async_crud, cache, config, crud, events, ndjson, schemas, serializers
+from ..database import DbSession, SessionLocal, get_db
+from .conditional import etag_matches
 
 router = APIRouter()
 
 
-# Dependency to get DB session
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/checklists/", response_model=List[schemas.Checklist])
-def read_checklists(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def read_checklists(skip: int = 0, limit: int = 100, db: DbSession = Depends(get_db)):
     """Get all checklists"""
-    checklists = crud.get_checklists(db, skip=skip, limit=limit)
-    return checklists
+    checklists = await async_crud.get_checklist_trees(db, skip=skip, limit=limit)
+    return serializers.ORJSONResponse(checklists)
+
+
+def _encode_cursor(created_at: datetime.datetime, checklist_id: int) -> str:
+    """Encode a listing position as an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{checklist_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    """Decode a cursor produced by _encode_cursor into (created_at, id)"""
+    try:
+        created_at, checklist_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(created_at), int(checklist_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/checklists/summary", response_model=schemas.ChecklistSummaryPage)
+async def read_checklist_summaries(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: DbSession = Depends(get_db)
+):
+    """Get a page of lightweight checklist summaries with counts, newest first"""
+    after = _decode_cursor(cursor) if cursor else None
+    rows = await async_crud.get_checklist_summaries(db, limit=limit, after=after)
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
 
 
 @router.post("/checklists/", response_model=schemas.Checklist, status_code=status.HTTP_201_CREATED)
-def create_checklist(checklist: schemas.ChecklistCreate, db: Session = Depends(get_db)):
+async def create_checklist(checklist: schemas.ChecklistCreate, db: DbSession = Depends(get_db)):
     """Create a new checklist"""
-    return crud.create_checklist(db=db, checklist=checklist)
+    return await async_crud.create_checklist(db=db, checklist=checklist)
+
+
+def _import_error(line_number: int, error) -> dict:
+    """Describe why an import line was rejected"""
+    if isinstance(error, ValidationError):
+        error = "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+        )
+    return {"line": line_number, "error": str(error)}
+
+
+@router.post("/checklists/import", response_model=schemas.ChecklistImportResult)
+async def import_checklists(request: Request, db: DbSession = Depends(get_db)):
+    """Create checklists from an NDJSON body, one ChecklistCreate document per line
+
+    The body is parsed as it arrives and written IMPORT_BATCH_SIZE checklists
+    per transaction. Invalid lines are reported by line number and skipped;
+    if a batch cannot be stored, all of its lines are reported instead.
+    """
+    result = {"created": [], "errors": []}
+    batch = []
+
+    async def store():
+        try:
+            rows = await async_crud.create_checklists(db, [checklist for _, checklist in batch])
+        except SQLAlchemyError as e:
+            result["errors"].extend(_import_error(line_number, f"Could not be stored: {e}") for line_number, _ in batch)
+        else:
+            result["created"].extend(
+                {"line": line_number, "id": row.id, "public_link": row.public_link, "edit_token": row.edit_token}
+                for (line_number, _), row in zip(batch, rows)
+            )
+        batch.clear()
+
+    async for line_number, line in ndjson.read_lines(request.stream(), config.IMPORT_MAX_LINE_BYTES):
+        if line is None:
+            result["errors"].append(_import_error(line_number, f"Longer than {config.IMPORT_MAX_LINE_BYTES} bytes"))
+            continue
+        try:
+            document = serializers.loads(line)
+            if not isinstance(document, dict):
+                raise ValueError("Expected a JSON object")
+            batch.append((line_number, schemas.ChecklistCreate(**document)))
+        except (ValueError, ValidationError) as e:
+            result["errors"].append(_import_error(line_number, e))
+            continue
+        if len(batch) >= config.IMPORT_BATCH_SIZE:
+            await store()
+    if batch:
+        await store()
+    return serializers.ORJSONResponse(result)
+
+
+def _export_lines():
+    """NDJSON of every checklist template, read with a session of its own
+
+    The response streams after the endpoint returns, so it cannot use the
+    request's session; iterated in the threadpool, one batch at a time.
+    """
+    with SessionLocal() as db:
+        yield from ndjson.encode(crud.iter_checklist_templates(db))
+
+
+@router.get("/checklists/export.ndjson")
+async def export_checklists():
+    """Stream every checklist as NDJSON, in the format POST /checklists/import accepts"""
+    return StreamingResponse(
+        _export_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="checklists.ndjson"'}
+    )
 
 
 @router.get("/checklists/{checklist_id}", response_model=schemas.Checklist)
-def read_checklist(checklist_id: int, db: Session = Depends(get_db)):
+async def read_checklist(checklist_id: int, db: DbSession = Depends(get_db)):
     """Get a specific checklist by ID"""
-    db_checklist = crud.get_checklist(db, checklist_id=checklist_id)
-    if db_checklist is None:
+    checklist = await async_crud.get_checklist_tree(db, checklist_id=checklist_id)
+    if checklist is None:
         raise HTTPException(status_code=404, detail="Checklist not found")
-    return db_checklist
+    return serializers.ORJSONResponse(checklist)
+
+
+def _etag(public_link: str, version: int) -> str:
+    """Strong ETag for a version of a checklist
+
+    Built from the public link, which unlike the id is never reused, so a
+    client holding a deleted checklist's ETag cannot match a new checklist.
+    """
+    return f'"{public_link}.{version}"'
 
 
 @router.get("/checklists/public/{public_link}", response_model=schemas.Checklist)
-def read_checklist_by_public_link(public_link: str, db: Session = Depends(get_db)):
-    """Get a checklist by its public link (read-only access with file upload permission)"""
-    db_checklist = crud.get_checklist_by_public_link(db, public_link=public_link)
-    if db_checklist is None:
+async def read_checklist_by_public_link(
+    public_link: str,
+    if_none_match: Optional[str] = Header(None),
+    db: DbSession = Depends(get_db)
+):
+    """Get a checklist by its public link (read-only access with file upload permission)
+
+    Responses carry an ETag derived from the checklist version: a matching
+    If-None-Match gets a 304 after a single-row lookup, and full bodies are
+    served from an in-process cache until the checklist changes.
+    """
+    current = await async_crud.get_checklist_version_by_public_link(db, public_link=public_link)
+    if current is None:
         raise HTTPException(status_code=404, detail="Checklist not found")
-    return db_checklist
+    
+    headers = {"ETag": _etag(public_link, current.version), "Cache-Control": "no-cache"}
+    if etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    key = (public_link, current.version)
+    body = cache.public_checklists.get(key)
+    if body is None:
+        # A change committed since the version lookup can only make the tree
+        # newer than its key, which at worst costs a client one extra 200
+        checklist = await async_crud.get_checklist_tree(db, checklist_id=current.id)
+        if checklist is None:
+            raise HTTPException(status_code=404, detail="Checklist not found")
+        body = serializers.dumps(checklist)
+        cache.public_checklists.put(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/checklists/public/{public_link}/events")
+async def stream_checklist_events(public_link: str, db: DbSession = Depends(get_db)):
+    """Server-Sent Events stream of changes to a checklist, for live views of a public link
+
+    Events are small deltas (see events.py); on "resync" or "checklist_changed"
+    the client should re-fetch the checklist.
+    """
+    current = await async_crud.get_checklist_version_by_public_link(db, public_link=public_link)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Checklist not found")
+    try:
+        subscription = events.hub.subscribe(current.id)
+    except events.TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(
+        events.stream(subscription, events.hub, config.EVENTS_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops nginx from holding events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/checklists/edit/{edit_token}", response_model=schemas.Checklist)
-def read_checklist_by_edit_token(edit_token: str, db: Session = Depends(get_db)):
+async def read_checklist_by_edit_token(edit_token: str, db: DbSession = Depends(get_db)):
     """Get a checklist by its edit token (full edit access)"""
-    db_checklist = crud.get_checklist_by_edit_token(db, edit_token=edit_token)
-    if db_checklist is None:
+    checklist = await async_crud.get_checklist_tree_by_edit_token(db, edit_token=edit_token)
+    if checklist is None:
         raise HTTPException(status_code=404, detail="Checklist not found")
-    return db_checklist
+    return serializers.ORJSONResponse(checklist)
 
 
 @router.put("/checklists/{checklist_id}", response_model=schemas.Checklist)
-def update_checklist(checklist_id: int, checklist: schemas.ChecklistUpdate, db: Session = Depends(get_db)):
+async def update_checklist(checklist_id: int, checklist: schemas.ChecklistUpdate, background_tasks: BackgroundTasks,
+                           db: DbSession = Depends(get_db)):
     """Update a checklist"""
-    db_checklist = crud.update_checklist(db, checklist_id=checklist_id, checklist=checklist)
-    if db_checklist is None:
+    updated = await async_crud.update_checklist(db, checklist_id=checklist_id, checklist=checklist)
+    if updated is None:
         raise HTTPException(status_code=404, detail="Checklist not found")
+    db_checklist, orphans = updated
+    events.hub.publish(checklist_id, "checklist_changed")
+    # Files of removed items are removed after the response is sent
+    background_tasks.add_task(crud.remove_orphans, orphans)
     return db_checklist
 
 
 @router.delete("/checklists/{checklist_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_checklist(checklist_id: int, db: Session = Depends(get_db)):
+async def delete_checklist(checklist_id: int, background_tasks: BackgroundTasks, db: DbSession = Depends(get_db)):
     """Delete a checklist"""
-    success = crud.delete_checklist(db, checklist_id=checklist_id)
-    if not success:
+    public_link = await async_crud.get_checklist_public_link(db, checklist_id=checklist_id)
+    orphans = await async_crud.delete_checklist(db, checklist_id=checklist_id)
+    if orphans is None:
         raise HTTPException(status_code=404, detail="Checklist not found")
+    cache.public_checklists.evict(public_link)
+    events.hub.publish(checklist_id, "checklist_deleted")
+    # Stored files are removed after the response is sent
+    background_tasks.add_task(crud.remove_orphans, orphans)
     return {"ok": True}
 
 
 @router.post("/checklists/{checklist_id}/clone", response_model=schemas.Checklist)
-def clone_checklist(checklist_id: int, new_title: Optional[str] = None, db: Session = Depends(get_db)):
+async def clone_checklist(checklist_id: int, new_title: Optional[str] = None, db: DbSession = Depends(get_db)):
     """Clone an existing checklist"""
-    db_checklist = crud.clone_checklist(db, checklist_id=checklist_id, new_title=new_title)
+    db_checklist = await async_crud.clone_checklist(db, checklist_id=checklist_id, new_title=new_title)
     if db_checklist is None:
         raise HTTPException(status_code=404, detail="Checklist not found")
     return db_checklist
@@ -85,55 +248,78 @@ def clone_checklist(checklist_id: int, new_title: Optional[str] = None, db: Sess
 
 # Category endpoints
 @router.post("/checklists/{checklist_id}/categories/", response_model=schemas.Category)
-def create_category(checklist_id: int, category: schemas.CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(checklist_id: int, category: schemas.CategoryCreate, db: DbSession = Depends(get_db)):
     """Create a new category for a checklist"""
-    db_checklist = crud.get_checklist(db, checklist_id=checklist_id)
+    db_checklist = await async_crud.get_checklist(db, checklist_id=checklist_id)
     if db_checklist is None:
         raise HTTPException(status_code=404, detail="Checklist not found")
-    return crud.create_category(db=db, category=category, checklist_id=checklist_id)
+    db_category = await async_crud.create_category(db=db, category=category, checklist_id=checklist_id)
+    events.hub.publish(checklist_id, "checklist_changed")
+    return db_category
 
 
 @router.put("/categories/{category_id}", response_model=schemas.Category)
-def update_category(category_id: int, category: schemas.CategoryUpdate, db: Session = Depends(get_db)):
+async def update_category(category_id: int, category: schemas.CategoryUpdate, background_tasks: BackgroundTasks,
+                          db: DbSession = Depends(get_db)):
     """Update a category"""
-    db_category = crud.update_category(db, category_id=category_id, category=category)
-    if db_category is None:
+    updated = await async_crud.update_category(db, category_id=category_id, category=category)
+    if updated is None:
         raise HTTPException(status_code=404, detail="Category not found")
+    db_category, orphans = updated
+    events.hub.publish(db_category.checklist_id, "checklist_changed")
+    # Files of removed items are removed after the response is sent
+    background_tasks.add_task(crud.remove_orphans, orphans)
     return db_category
 
 
 @router.delete("/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(category_id: int, db: Session = Depends(get_db)):
+async def delete_category(category_id: int, background_tasks: BackgroundTasks, db: DbSession = Depends(get_db)):
     """Delete a category"""
-    success = crud.delete_category(db, category_id=category_id)
-    if not success:
+    checklist_id = await events.checklist_of("category", category_id)
+    orphans = await async_crud.delete_category(db, category_id=category_id)
+    if orphans is None:
         raise HTTPException(status_code=404, detail="Category not found")
+    events.hub.publish(checklist_id, "checklist_changed")
+    # Stored files are removed after the response is sent
+    background_tasks.add_task(crud.remove_orphans, orphans)
     return {"ok": True}
 
 
 # Item endpoints
 @router.post("/categories/{category_id}/items/", response_model=schemas.Item)
-def create_item(category_id: int, item: schemas.ItemCreate, db: Session = Depends(get_db)):
+async def create_item(category_id: int, item: schemas.ItemCreate, db: DbSession = Depends(get_db)):
     """Create a new item for a category"""
-    db_category = crud.get_category(db, category_id=category_id)
+    db_category = await async_crud.get_category(db, category_id=category_id)
     if db_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
-    return crud.create_item(db=db, item=item, category_id=category_id)
+    db_item = await async_crud.create_item(db=db, item=item, category_id=category_id)
+    events.hub.publish(db_category.checklist_id, "item_added", category_id=category_id, item={
+        "id": db_item.id, "name": db_item.name, "allow_multiple_files": bool(db_item.allow_multiple_files), "uploads": []
+    })
+    return db_item
 
 
 @router.put("/items/{item_id}", response_model=schemas.Item)
-def update_item(item_id: int, item: schemas.ItemUpdate, db: Session = Depends(get_db)):
+async def update_item(item_id: int, item: schemas.ItemUpdate, db: DbSession = Depends(get_db)):
     """Update an item"""
-    db_item = crud.update_item(db, item_id=item_id, item=item)
+    db_item = await async_crud.update_item(db, item_id=item_id, item=item)
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
+    events.hub.publish(
+        await events.checklist_of("item", item_id), "item_updated",
+        item_id=item_id, name=db_item.name, allow_multiple_files=bool(db_item.allow_multiple_files)
+    )
     return db_item
 
 
 @router.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_item(item_id: int, db: Session = Depends(get_db)):
+async def delete_item(item_id: int, background_tasks: BackgroundTasks, db: DbSession = Depends(get_db)):
     """Delete an item"""
-    success = crud.delete_item(db, item_id=item_id)
-    if not success:
+    checklist_id = await events.checklist_of("item", item_id)
+    orphans = await async_crud.delete_item(db, item_id=item_id)
+    if orphans is None:
         raise HTTPException(status_code=404, detail="Item not found")
+    events.hub.publish(checklist_id, "item_removed", item_id=item_id)
+    # Stored files are removed after the response is sent
+    background_tasks.add_task(crud.remove_orphans, orphans)
     return {"ok": True}
@@ -0,0 +1,10 @@
+# Conditional request helpers shared by the routers
+from typing import Optional
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Whether an If-None-Match header matches etag, in its weak or wildcard forms too"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
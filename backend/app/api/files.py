@@ -1,127 +1,399 @@
+import asyncio
+import mimetypes
 import os
-import shutil
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from sqlalchemy.orm import Session
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, UploadFile, File, Form, status
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
+from urllib.parse import quote
 
-from .. import crud, schemas, database
+from .. import async_crud, config, crud, events, exports, jobs, metrics, schemas, storage
+from ..database import DbSession, get_db
+from .conditional import etag_matches
 
 router = APIRouter()
 
-# Configure upload directory
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Suggested upload size limit
+MAX_SIZE = 10 * 1024 * 1024  # 10MB in bytes
+SUGGESTED_EXTENSIONS = [".txt", ".pdf", ".xlsx"]
 
+SINGLE_FILE_ONLY = "This item does not allow multiple file uploads. Delete the existing file first."
+FILE_TOO_LARGE = "File too large. Suggested maximum size is 10MB."
+ITEM_NOT_FOUND = "Item not found"
 
-# Dependency to get DB session
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def _store(file: UploadFile):
+    """Stage an upload in storage, recording its size and time; blocking
+
+    Returns (temporary path, digest, size); see storage.store_stream.
+    """
+    start = time.perf_counter()
+    tmp_path, digest, size = storage.store_stream(file.file, MAX_SIZE)
+    metrics.record_upload(size, time.perf_counter() - start)
+    return tmp_path, digest, size
+
+
+def _extension_error(filename: str) -> Optional[str]:
+    """Why a file type is rejected, or None if it is allowed"""
+    if os.path.splitext(filename)[1].lower() not in SUGGESTED_EXTENSIONS:
+        return f"File type not recommended. Suggested file types are: {', '.join(SUGGESTED_EXTENSIONS)}"
+    return None
 
 
 @router.post("/items/{item_id}/uploads/", response_model=schemas.FileUpload, status_code=status.HTTP_201_CREATED)
-async def upload_file(item_id: int, file: UploadFile = File(...), uploader: Optional[str] = Form(None), db: Session = Depends(get_db)):
+async def upload_file(item_id: int, file: UploadFile = File(...), uploader: Optional[str] = Form(None), db: DbSession = Depends(get_db)):
     """Upload a file for a specific checklist item"""
     # Check if item exists
-    db_item = crud.get_item(db, item_id=item_id)
+    db_item = await async_crud.get_item(db, item_id=item_id)
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
     
     # Check if multiple files are allowed for this item
     if not db_item.allow_multiple_files:
         # If multiple files are not allowed, check if there are already uploads
-        existing_uploads = crud.get_file_uploads_by_item(db, item_id=item_id)
+        existing_uploads = await async_crud.get_file_uploads_by_item(db, item_id=item_id)
         if existing_uploads:
-            raise HTTPException(
-                status_code=400, 
-                detail="This item does not allow multiple file uploads. Delete the existing file first."
-            )
+            raise HTTPException(status_code=400, detail=SINGLE_FILE_ONLY)
     
     # Validate file type (suggested: .txt, .pdf, .xlsx)
     filename = file.filename
-    file_extension = os.path.splitext(filename)[1].lower()
-    suggested_extensions = [".txt", ".pdf", ".xlsx"]
-    
-    if file_extension not in suggested_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File type not recommended. Suggested file types are: {', '.join(suggested_extensions)}"
-        )
-    
-    # Check file size (suggested limit: 10MB)
-    MAX_SIZE = 10 * 1024 * 1024  # 10MB in bytes
-    
-    # Read file content to check size
-    contents = await file.read(MAX_SIZE + 1)  # Read slightly more to check if it exceeds
-    if len(contents) > MAX_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Suggested maximum size is 10MB."
-        )
-    
-    # Reset file pointer after reading
-    await file.seek(0)
-    
-    # Save file to disk
-    file_path = os.path.join(UPLOAD_DIR, f"{item_id}_{filename}")
+    extension_error = _extension_error(filename)
+    if extension_error:
+        raise HTTPException(status_code=400, detail=extension_error)
     
+    # Stream file into content-addressed storage off the event loop,
+    # checking the size limit as we go
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)  # Write the content we already read
+        tmp_path, digest, size = await run_in_threadpool(_store, file)
+    except storage.FileTooLarge:
+        raise HTTPException(status_code=400, detail=FILE_TOO_LARGE)
     finally:
-        file.file.close()
+        await file.close()
     
     # Create file upload record in database
     file_upload = schemas.FileUploadCreate(
         filename=filename,
-        uploader=uploader
+        uploader=uploader,
+        sha256=digest,
+        size=size
+    )
+    
+    try:
+        db_file = await async_crud.create_file_upload(
+            db=db, file_upload=file_upload, item_id=item_id, staged={digest: tmp_path}
+        )
+    except IntegrityError:
+        # The item was deleted while the file was being stored
+        raise HTTPException(status_code=404, detail=ITEM_NOT_FOUND)
+    finally:
+        # Published by now unless the record could not be created, e.g. the
+        # item was deleted meanwhile; then nothing references the content
+        storage.discard(tmp_path)
+    jobs.queue.enqueue([db_file.id])
+    events.hub.publish(
+        await events.checklist_of("item", item_id), "upload_added",
+        item_id=item_id, upload=events.upload_fields(db_file)
     )
+    return db_file
+
+
+async def _upload_batch(db: DbSession, files: List[UploadFile], item_ids: List[int], uploader: Optional[str],
+                        checklist_id: Optional[int] = None):
+    """Validate, store and record many files at once, returning a result per file
     
-    return crud.create_file_upload(db=db, file_upload=file_upload, item_id=item_id)
+    Upload rules are loaded for all target items in one query and checked once
+    per item, accepted files are written to storage concurrently and all their
+    records are inserted in a single transaction.
+    """
+    staged = {}
+    try:
+        targets = await async_crud.get_upload_targets(db, item_ids=list(set(item_ids)))
+        results, accepted, filled = [], [], set()
+        for file, item_id in zip(files, item_ids):
+            result = {"filename": file.filename, "item_id": item_id, "upload": None, "error": None}
+            target = targets.get(item_id)
+            if target is None or (checklist_id is not None and target.checklist_id != checklist_id):
+                result["error"] = ITEM_NOT_FOUND
+            elif not target.allow_multiple_files and (target.upload_count or item_id in filled):
+                result["error"] = SINGLE_FILE_ONLY
+            else:
+                result["error"] = _extension_error(file.filename)
+            if result["error"] is None:
+                filled.add(item_id)
+                accepted.append((result, file))
+            results.append(result)
+        
+        stored = await asyncio.gather(
+            *(run_in_threadpool(_store, file) for _, file in accepted),
+            return_exceptions=True
+        )
+        for outcome in stored:
+            if not isinstance(outcome, BaseException):
+                tmp_path, digest, _ = outcome
+                if digest in staged:
+                    storage.discard(tmp_path)  # Same content as another file of the batch
+                else:
+                    staged[digest] = tmp_path
+        records = []
+        for (result, file), outcome in zip(accepted, stored):
+            if isinstance(outcome, storage.FileTooLarge):
+                result["error"] = FILE_TOO_LARGE
+                continue
+            if isinstance(outcome, BaseException):
+                raise outcome
+            _, digest, size = outcome
+            records.append((result, schemas.FileUploadCreate(
+                filename=file.filename,
+                uploader=uploader,
+                sha256=digest,
+                size=size
+            )))
+        
+        async def create(records):
+            return await async_crud.create_file_uploads(
+                db,
+                uploads=[(result["item_id"], file_upload) for result, file_upload in records],
+                staged={file_upload.sha256: staged[file_upload.sha256] for _, file_upload in records}
+            )
+        
+        try:
+            uploads = await create(records)
+        except IntegrityError:
+            # Items were deleted while their files were being stored: those
+            # files fail as the checks above would have, the rest are recorded
+            current = await async_crud.get_upload_targets(
+                db, item_ids=list({result["item_id"] for result, _ in records})
+            )
+            if all(result["item_id"] in current for result, _ in records):
+                raise
+            for result, _ in records:
+                if result["item_id"] not in current:
+                    result["error"] = ITEM_NOT_FOUND
+            records = [(result, file_upload) for result, file_upload in records if result["item_id"] in current]
+            uploads = await create(records)
+        for (result, _), upload in zip(records, uploads):
+            result["upload"] = upload
+        jobs.queue.enqueue(upload.id for upload in uploads)
+        for result, _ in records:
+            events.hub.publish(
+                targets[result["item_id"]].checklist_id, "upload_added",
+                item_id=result["item_id"], upload=events.upload_fields(result["upload"])
+            )
+        return results
+    finally:
+        for file in files:
+            await file.close()
+        for tmp_path in staged.values():
+            storage.discard(tmp_path)
+
+
+@router.post("/items/{item_id}/uploads/batch", response_model=List[schemas.FileUploadResult])
+async def upload_files(
+    item_id: int,
+    files: List[UploadFile] = File(...),
+    uploader: Optional[str] = Form(None),
+    db: DbSession = Depends(get_db)
+):
+    """Upload several files for a checklist item, with a result per file"""
+    results = await _upload_batch(db, files, [item_id] * len(files), uploader)
+    if results and results[0]["error"] == ITEM_NOT_FOUND:
+        raise HTTPException(status_code=404, detail=ITEM_NOT_FOUND)
+    return results
+
+
+@router.post("/checklists/{checklist_id}/uploads/batch", response_model=List[schemas.FileUploadResult])
+async def upload_checklist_files(
+    checklist_id: int,
+    files: List[UploadFile] = File(...),
+    item_ids: List[int] = Form(...),
+    uploader: Optional[str] = Form(None),
+    db: DbSession = Depends(get_db)
+):
+    """Upload files for several items of a checklist; item_ids gives each file's item, in order"""
+    if len(item_ids) != len(files):
+        raise HTTPException(status_code=400, detail="Provide one item_ids value per file")
+    return await _upload_batch(db, files, item_ids, uploader, checklist_id=checklist_id)
 
 
 @router.get("/items/{item_id}/uploads/", response_model=List[schemas.FileUpload])
-def read_file_uploads(item_id: int, db: Session = Depends(get_db)):
+async def read_file_uploads(item_id: int, db: DbSession = Depends(get_db)):
     """Get all file uploads for a specific item"""
-    db_item = crud.get_item(db, item_id=item_id)
+    db_item = await async_crud.get_item(db, item_id=item_id)
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    return crud.get_file_uploads_by_item(db, item_id=item_id)
+    return await async_crud.get_file_uploads_by_item(db, item_id=item_id)
 
 
 @router.get("/uploads/{file_id}", response_model=schemas.FileUpload)
-def read_file_upload(file_id: int, db: Session = Depends(get_db)):
+async def read_file_upload(file_id: int, db: DbSession = Depends(get_db)):
     """Get a specific file upload by ID"""
-    db_file = crud.get_file_upload(db, file_id=file_id)
+    db_file = await async_crud.get_file_upload(db, file_id=file_id)
     if db_file is None:
         raise HTTPException(status_code=404, detail="File upload not found")
     
     return db_file
 
 
-@router.delete("/uploads/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_file_upload(file_id: int, db: Session = Depends(get_db)):
-    """Delete a file upload"""
-    db_file = crud.get_file_upload(db, file_id=file_id)
+def _not_modified(etag: str, mtime: float, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Whether conditional request headers show the client's copy is current"""
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        return etag_matches(etag, if_none_match)
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _content_disposition(disposition: str, filename: str) -> str:
+    """Content-Disposition header value, RFC 5987 encoding non-ASCII filenames"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+async def _serve_upload(
+    file_id: int,
+    db: DbSession,
+    disposition: str,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str]
+):
+    """Response streaming an upload's content, honouring conditional and Range requests"""
+    db_file = await async_crud.get_file_upload(db, file_id=file_id)
     if db_file is None:
         raise HTTPException(status_code=404, detail="File upload not found")
     
-    # Delete file from disk
+    path = storage.upload_path(db_file.sha256, db_file.item_id, db_file.filename)
     try:
-        file_path = os.path.join(UPLOAD_DIR, f"{db_file.item_id}_{db_file.filename}")
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception as e:
-        # Log the error but continue with database deletion
-        print(f"Error deleting file: {e}")
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File content not found")
+    
+    # Blobs are content-addressed, so their digest is a strong validator;
+    # legacy files fall back to modification time and size
+    etag = f'"{db_file.sha256}"' if db_file.sha256 else f'"{int(stat_result.st_mtime)}-{stat_result.st_size}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": f"public, max-age={config.UPLOAD_CACHE_MAX_AGE}",
+    }
+    if _not_modified(etag, stat_result.st_mtime, if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    media_type = mimetypes.guess_type(db_file.filename)[0] or "application/octet-stream"
+    headers["Content-Disposition"] = _content_disposition(disposition, db_file.filename)
+    if config.UPLOAD_ACCEL_REDIRECT:
+        # nginx sends the file itself (sendfile, Range) from its internal location
+        location = os.path.relpath(path, storage.UPLOAD_DIR).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = config.UPLOAD_ACCEL_REDIRECT.rstrip("/") + "/" + quote(location)
+        return Response(media_type=media_type, headers=headers)
+    
+    # FileResponse handles Range requests and uses the server's zero-copy
+    # pathsend extension when available, streaming in chunks otherwise
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result)
+
+
+@router.api_route("/uploads/{file_id}/content", methods=["GET", "HEAD"])
+async def read_file_content(
+    file_id: int,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: DbSession = Depends(get_db)
+):
+    """Get the content of a file upload, for display in the browser"""
+    return await _serve_upload(file_id, db, "inline", if_none_match, if_modified_since)
+
+
+@router.api_route("/uploads/{file_id}/download", methods=["GET", "HEAD"])
+async def download_file(
+    file_id: int,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: DbSession = Depends(get_db)
+):
+    """Download a file upload as an attachment"""
+    return await _serve_upload(file_id, db, "attachment", if_none_match, if_modified_since)
+
+
+@router.get("/uploads/{file_id}/processing", response_model=schemas.UploadProcessing)
+async def read_upload_processing(file_id: int, db: DbSession = Depends(get_db)):
+    """Get the background processing status of a file upload"""
+    processing = await async_crud.get_upload_processing(db, file_id=file_id)
+    if processing is None:
+        raise HTTPException(status_code=404, detail="File upload not found")
+    return processing
+
+
+@router.get("/uploads/{file_id}/text", response_class=PlainTextResponse)
+async def read_upload_text(file_id: int, db: DbSession = Depends(get_db)):
+    """Get the text extracted from a file upload; empty until processing is done"""
+    text = await async_crud.get_upload_text(db, file_id=file_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="File upload not found")
+    return text
+
+
+@router.get("/uploads/{file_id}/thumbnail")
+async def read_upload_thumbnail(file_id: int, db: DbSession = Depends(get_db)):
+    """Get the first-page thumbnail rendered for a PDF upload"""
+    db_file = await async_crud.get_file_upload(db, file_id=file_id)
+    if db_file is None or not db_file.has_thumbnail:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    # Thumbnails are derived from content-addressed blobs, so never change
+    return FileResponse(
+        storage.thumbnail_path(db_file.sha256),
+        media_type="image/png",
+        headers={"ETag": f'"{db_file.sha256}.png"', "Cache-Control": f"public, max-age={config.UPLOAD_CACHE_MAX_AGE}"}
+    )
+
+
+@router.get("/jobs", response_model=schemas.JobQueueStatus)
+async def read_job_queue(db: DbSession = Depends(get_db)):
+    """Get the state of the background upload processing queue"""
+    return {
+        "running": jobs.queue.running,
+        "workers": jobs.queue.workers,
+        "queued": jobs.queue.queued,
+        "pending_uploads": await async_crud.count_unprocessed_uploads(db)
+    }
+
+
+@router.get("/checklists/{checklist_id}/export.zip")
+async def export_checklist_uploads(checklist_id: int, db: DbSession = Depends(get_db)):
+    """Download every file uploaded to a checklist as a ZIP, organized by category and item"""
+    export = await async_crud.get_checklist_upload_entries(db, checklist_id=checklist_id)
+    if export is None:
+        raise HTTPException(status_code=404, detail="Checklist not found")
     
-    # Delete record from database
-    success = crud.delete_file_upload(db, file_id=file_id)
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to delete file upload record")
+    # The archive is generated while it is sent; StreamingResponse pulls each
+    # chunk from a worker thread only once the previous one has been written
+    title, entries = export
+    return StreamingResponse(
+        exports.zip_uploads(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": _content_disposition("attachment", f"{exports.safe_name(title)}.zip")}
+    )
+
+
+@router.delete("/uploads/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_file_upload(file_id: int, background_tasks: BackgroundTasks, db: DbSession = Depends(get_db)):
+    """Delete a file upload"""
+    upload = await async_crud.get_file_upload(db, file_id=file_id) if events.hub.active else None
+    checklist_id = await events.checklist_of("upload", file_id)
+    orphans = await async_crud.delete_file_upload(db, file_id=file_id)
+    if orphans is None:
+        raise HTTPException(status_code=404, detail="File upload not found")
+    if upload is not None:
+        events.hub.publish(checklist_id, "upload_removed", item_id=upload.item_id, upload_id=file_id)
     
+    # Its blob (once unreferenced) or legacy file is removed after the response is sent
+    background_tasks.add_task(crud.remove_orphans, orphans)
     return {"ok": True}
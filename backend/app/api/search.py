@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .. import async_crud, crud, schemas
+from ..database import DbSession, get_db
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=schemas.SearchPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: DbSession = Depends(get_db)
+):
+    """Search checklist titles and descriptions, category and item names, and upload filenames and text"""
+    try:
+        hits = await async_crud.search(db, query=q, limit=limit, offset=offset)
+    except crud.SearchUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    next_offset = offset + limit if len(hits) > limit else None
+    return {"items": hits[:limit], "next_offset": next_offset}
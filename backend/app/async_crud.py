@@ -0,0 +1,186 @@
+# Async counterparts of the crud functions. Each one runs its crud equivalent
+# through database.run_db, so routers can await it with either an AsyncSession
+# (async engine) or a sync Session (threadpool). Returned objects are fully
+# loaded, so serializing them never triggers lazy loads.
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from . import crud, schemas
+from .database import DbSession, run_db
+
+
+# Checklist operations
+async def get_checklist(db: DbSession, checklist_id: int):
+    """Get a checklist by ID"""
+    return await run_db(db, crud.get_checklist, checklist_id=checklist_id)
+
+
+async def get_checklist_by_public_link(db: DbSession, public_link: str):
+    """Get a checklist by its public link"""
+    return await run_db(db, crud.get_checklist_by_public_link, public_link=public_link)
+
+
+async def get_checklist_by_edit_token(db: DbSession, edit_token: str):
+    """Get a checklist by its edit token"""
+    return await run_db(db, crud.get_checklist_by_edit_token, edit_token=edit_token)
+
+
+async def get_checklist_version_by_public_link(db: DbSession, public_link: str):
+    """Get (id, version) of the checklist with a public link, without loading its tree"""
+    return await run_db(db, crud.get_checklist_version_by_public_link, public_link=public_link)
+
+
+async def get_checklist_public_link(db: DbSession, checklist_id: int):
+    """Get the public link of a checklist, or None if it does not exist"""
+    return await run_db(db, crud.get_checklist_public_link, checklist_id=checklist_id)
+
+
+async def get_checklists(db: DbSession, skip: int = 0, limit: int = 100):
+    """Get all checklists with pagination"""
+    return await run_db(db, crud.get_checklists, skip=skip, limit=limit)
+
+
+async def get_checklist_tree(db: DbSession, checklist_id: int):
+    """Get a checklist by ID as a nested dict ready for JSON encoding"""
+    return await run_db(db, crud.get_checklist_tree, checklist_id=checklist_id)
+
+
+async def get_checklist_tree_by_edit_token(db: DbSession, edit_token: str):
+    """Get a checklist by its edit token as a nested dict ready for JSON encoding"""
+    return await run_db(db, crud.get_checklist_tree_by_edit_token, edit_token=edit_token)
+
+
+async def get_checklist_trees(db: DbSession, skip: int = 0, limit: int = 100):
+    """Get checklists with pagination as nested dicts ready for JSON encoding"""
+    return await run_db(db, crud.get_checklist_trees, skip=skip, limit=limit)
+
+
+async def get_checklist_summaries(db: DbSession, limit: int = 100, after: Optional[Tuple[datetime, int]] = None):
+    """Get checklist summaries with category/item/upload counts, newest first"""
+    return await run_db(db, crud.get_checklist_summaries, limit=limit, after=after)
+
+
+async def create_checklist(db: DbSession, checklist: schemas.ChecklistCreate):
+    """Create a new checklist with categories and items"""
+    return await run_db(db, crud.create_checklist, checklist=checklist)
+
+
+async def create_checklists(db: DbSession, checklists: List[schemas.ChecklistCreate]):
+    """Create many checklists with their categories and items in one transaction"""
+    return await run_db(db, crud.create_checklists, checklists=checklists)
+
+
+async def update_checklist(db: DbSession, checklist_id: int, checklist: schemas.ChecklistUpdate):
+    """Update a checklist's basic information"""
+    return await run_db(db, crud.update_checklist, checklist_id=checklist_id, checklist=checklist)
+
+
+async def delete_checklist(db: DbSession, checklist_id: int):
+    """Delete a checklist and all its categories, items, and file uploads"""
+    return await run_db(db, crud.delete_checklist, checklist_id=checklist_id)
+
+
+async def clone_checklist(db: DbSession, checklist_id: int, new_title: Optional[str] = None):
+    """Clone an existing checklist with all its categories and items"""
+    return await run_db(db, crud.clone_checklist, checklist_id=checklist_id, new_title=new_title)
+
+
+# Category operations
+async def get_category(db: DbSession, category_id: int):
+    """Get a category by ID"""
+    return await run_db(db, crud.get_category, category_id=category_id)
+
+
+async def create_category(db: DbSession, category: schemas.CategoryCreate, checklist_id: int):
+    """Create a new category with items"""
+    return await run_db(db, crud.create_category, category=category, checklist_id=checklist_id)
+
+
+async def update_category(db: DbSession, category_id: int, category: schemas.CategoryUpdate):
+    """Update a category's information"""
+    return await run_db(db, crud.update_category, category_id=category_id, category=category)
+
+
+async def delete_category(db: DbSession, category_id: int):
+    """Delete a category and all its items and file uploads"""
+    return await run_db(db, crud.delete_category, category_id=category_id)
+
+
+# Item operations
+async def get_item(db: DbSession, item_id: int):
+    """Get an item by ID"""
+    return await run_db(db, crud.get_item, item_id=item_id)
+
+
+async def create_item(db: DbSession, item: schemas.ItemCreate, category_id: int):
+    """Create a new item"""
+    return await run_db(db, crud.create_item, item=item, category_id=category_id)
+
+
+async def update_item(db: DbSession, item_id: int, item: schemas.ItemUpdate):
+    """Update an item's information"""
+    return await run_db(db, crud.update_item, item_id=item_id, item=item)
+
+
+async def delete_item(db: DbSession, item_id: int):
+    """Delete an item and all its file uploads"""
+    return await run_db(db, crud.delete_item, item_id=item_id)
+
+
+# File upload operations
+async def get_file_upload(db: DbSession, file_id: int):
+    """Get a file upload by ID"""
+    return await run_db(db, crud.get_file_upload, file_id=file_id)
+
+
+async def get_file_uploads_by_item(db: DbSession, item_id: int):
+    """Get all file uploads for an item"""
+    return await run_db(db, crud.get_file_uploads_by_item, item_id=item_id)
+
+
+async def get_checklist_upload_entries(db: DbSession, checklist_id: int):
+    """Title of a checklist and one row per file upload under it, in tree order"""
+    return await run_db(db, crud.get_checklist_upload_entries, checklist_id=checklist_id)
+
+
+async def get_upload_targets(db: DbSession, item_ids: List[int]):
+    """Map item id -> row of checklist_id, allow_multiple_files and upload_count"""
+    return await run_db(db, crud.get_upload_targets, item_ids=item_ids)
+
+
+async def create_file_upload(db: DbSession, file_upload: schemas.FileUploadCreate, item_id: int,
+                             staged: Optional[Dict[str, str]] = None):
+    """Create a new file upload record, referencing its stored blob"""
+    return await run_db(db, crud.create_file_upload, file_upload=file_upload, item_id=item_id, staged=staged)
+
+
+async def create_file_uploads(db: DbSession, uploads: List[tuple], staged: Optional[Dict[str, str]] = None):
+    """Create file upload records for (item_id, FileUploadCreate) pairs in one transaction"""
+    return await run_db(db, crud.create_file_uploads, uploads=uploads, staged=staged)
+
+
+async def delete_file_upload(db: DbSession, file_id: int):
+    """Delete a file upload record, releasing its blob"""
+    return await run_db(db, crud.delete_file_upload, file_id=file_id)
+
+
+# Search
+async def search(db: DbSession, query: str, limit: int = 20, offset: int = 0):
+    """Ranked hits for query across checklists, categories, items and uploads"""
+    return await run_db(db, crud.search, query=query, limit=limit, offset=offset)
+
+
+# Upload processing
+async def get_upload_processing(db: DbSession, file_id: int):
+    """Processing state of an upload as a dict for schemas.UploadProcessing, or None"""
+    return await run_db(db, crud.get_upload_processing, file_id=file_id)
+
+
+async def get_upload_text(db: DbSession, file_id: int):
+    """Text extracted from an upload, or None if the upload does not exist"""
+    return await run_db(db, crud.get_upload_text, file_id=file_id)
+
+
+async def count_unprocessed_uploads(db: DbSession):
+    """Number of uploads waiting for or undergoing processing"""
+    return await run_db(db, crud.count_unprocessed_uploads)
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class ResponseCache:
+    """In-process LRU cache of serialized response bodies, bounded by total bytes
+
+    Keys should include whatever version makes an entry stale (e.g. a
+    checklist's (id, version)), so entries never need explicit invalidation;
+    outdated ones simply stop being requested and age out.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return the cached body for key, marking it most recently used"""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Hashable, body: bytes):
+        """Cache body under key, evicting least recently used entries to fit"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def evict(self, prefix: Hashable):
+        """Drop every entry whose key is a tuple starting with prefix, e.g. all versions of a checklist"""
+        with self._lock:
+            for key in [key for key in self._entries if isinstance(key, tuple) and key[:1] == (prefix,)]:
+                self.size -= len(self._entries.pop(key))
+
+    def clear(self):
+        """Drop every entry; counters are kept"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """Snapshot of the cache counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Serialized public checklist views, keyed by (public link, version). Not by
+# checklist id: SQLite reuses the id of a deleted row, and a new checklist
+# must never be served the old one's body.
+public_checklists = ResponseCache(max_bytes=32 * 1024 * 1024)
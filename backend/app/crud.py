@@ -1,29 +1,617 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, bindparam, delete, exists, func, insert, literal, or_, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, selectinload
+import logging
 import uuid
-from datetime import datetime
-from typing import List, Optional
-from . import models, schemas
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from . import models, schemas, storage
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class Orphans(NamedTuple):
+    """Files a change left unreferenced, to remove once it has committed; see remove_orphans"""
+    paths: List[str]  # Legacy upload files
+    digests: List[str]  # Blobs whose last reference went
+
+
+NO_ORPHANS = Orphans([], [])
+
+
+# Eager-load the whole categories -> items -> uploads tree with one SELECT ... IN
+# per level, so serializing a checklist costs a constant number of queries
+# instead of one lazy load per category and item.
+CHECKLIST_TREE = (
+    selectinload(models.Checklist.categories)
+    .selectinload(models.Category.items)
+    .selectinload(models.Item.uploads)
+)
+
+
+def _checklist_tree_query(db: Session):
+    """Query checklists with their full category/item/upload tree"""
+    return db.query(models.Checklist).options(CHECKLIST_TREE)
 
 
 # Checklist operations
 def get_checklist(db: Session, checklist_id: int):
     """Get a checklist by ID"""
-    return db.query(models.Checklist).filter(models.Checklist.id == checklist_id).first()
+    return _checklist_tree_query(db).filter(models.Checklist.id == checklist_id).first()
 
 
 def get_checklist_by_public_link(db: Session, public_link: str):
     """Get a checklist by its public link"""
-    return db.query(models.Checklist).filter(models.Checklist.public_link == public_link).first()
+    return _checklist_tree_query(db).filter(models.Checklist.public_link == public_link).first()
 
 
 def get_checklist_by_edit_token(db: Session, edit_token: str):
     """Get a checklist by its edit token"""
-    return db.query(models.Checklist).filter(models.Checklist.edit_token == edit_token).first()
+    return _checklist_tree_query(db).filter(models.Checklist.edit_token == edit_token).first()
+
+
+def get_checklist_version_by_public_link(db: Session, public_link: str):
+    """Get (id, version) of the checklist with a public link, without loading its tree"""
+    return (
+        db.query(models.Checklist.id, models.Checklist.version)
+        .filter(models.Checklist.public_link == public_link)
+        .first()
+    )
+
+
+def get_checklist_public_link(db: Session, checklist_id: int) -> Optional[str]:
+    """Get the public link of a checklist, or None if it does not exist"""
+    return db.scalar(select(models.Checklist.public_link).where(models.Checklist.id == checklist_id))
+
+
+def _checklist_of_category(category_id: int):
+    """Scalar subquery selecting the checklist id owning a category"""
+    return (
+        select(models.Category.checklist_id)
+        .where(models.Category.id == category_id)
+        .scalar_subquery()
+    )
+
+
+def _checklist_of_item(item_id: int):
+    """Scalar subquery selecting the checklist id owning an item"""
+    return (
+        select(models.Category.checklist_id)
+        .join(models.Item, models.Item.category_id == models.Category.id)
+        .where(models.Item.id == item_id)
+        .scalar_subquery()
+    )
+
+
+def _checklist_of_upload(file_id: int):
+    """Scalar subquery selecting the checklist id owning a file upload"""
+    return (
+        select(models.Category.checklist_id)
+        .join(models.Item, models.Item.category_id == models.Category.id)
+        .join(models.FileUpload, models.FileUpload.item_id == models.Item.id)
+        .where(models.FileUpload.id == file_id)
+        .scalar_subquery()
+    )
+
+
+def _owner(kind: str, resource_id: int):
+    """Scalar subquery selecting the id of the checklist owning a resource
+
+    kind is "checklist", "category", "item" or "upload".
+    """
+    if kind == "checklist":
+        return select(models.Checklist.id).where(models.Checklist.id == resource_id).scalar_subquery()
+    owner_of = {"category": _checklist_of_category, "item": _checklist_of_item, "upload": _checklist_of_upload}.get(kind)
+    if owner_of is None:
+        raise ValueError(f"Unknown resource kind: {kind}")
+    return owner_of(resource_id)
+
+
+def get_owning_checklist_id(db: Session, kind: str, resource_id: int) -> Optional[int]:
+    """Id of the checklist owning a resource (see _owner), or None if it does not exist"""
+    return db.scalar(select(_owner(kind, resource_id)))
+
+
+def get_edit_access(db: Session, edit_token: str, kind: str, resource_id: int):
+    """Check an edit token against the checklist owning a resource, in one query
+
+    kind is "checklist", "category", "item" or "upload". Returns None if the
+    resource does not exist, otherwise whether the token is that checklist's.
+    """
+    token_owner = select(models.Checklist.id).where(models.Checklist.edit_token == edit_token)
+    owner_id, token_owner_id = db.execute(
+        select(_owner(kind, resource_id), token_owner.scalar_subquery())
+    ).one()
+    if owner_id is None:
+        return None
+    return owner_id == token_owner_id
 
 
 def get_checklists(db: Session, skip: int = 0, limit: int = 100):
     """Get all checklists with pagination"""
-    return db.query(models.Checklist).offset(skip).limit(limit).all()
+    return _checklist_tree_query(db).offset(skip).limit(limit).all()
+
+
+def _checklist_trees(db: Session, checklists):
+    """Assemble checklist rows and their category/item/upload rows into nested dicts
+
+    Uses plain Core rows instead of ORM objects and one query per level for
+    all the given checklists; the result matches schemas.Checklist and can be
+    JSON-encoded without going through Pydantic.
+    """
+    trees = [dict(row._mapping, categories=[]) for row in checklists]
+    if not trees:
+        return trees
+    checklist_ids = [tree["id"] for tree in trees]
+    by_checklist = {tree["id"]: tree["categories"] for tree in trees}
+
+    categories = db.execute(
+        select(
+            models.Category.id,
+            models.Category.name,
+            *(getattr(models.Category, name) for name in CATEGORY_COUNTERS),
+            models.Category.checklist_id
+        )
+        .where(models.Category.checklist_id.in_(checklist_ids))
+        .order_by(models.Category.id)
+    )
+    by_category = {}
+    for category in categories:
+        category = dict(category._mapping)
+        category["items"] = by_category[category["id"]] = []
+        by_checklist[category.pop("checklist_id")].append(category)
+
+    items = db.execute(
+        select(models.Item.id, models.Item.name, models.Item.allow_multiple_files, models.Item.category_id)
+        .join(models.Category, models.Item.category_id == models.Category.id)
+        .where(models.Category.checklist_id.in_(checklist_ids))
+        .order_by(models.Item.id)
+    )
+    by_item = {}
+    for item_id, name, allow_multiple_files, category_id in items:
+        uploads = by_item[item_id] = []
+        by_category[category_id].append({
+            "id": item_id,
+            "name": name,
+            "allow_multiple_files": bool(allow_multiple_files),
+            "uploads": uploads
+        })
+
+    uploads = db.execute(
+        select(
+            models.FileUpload.id,
+            models.FileUpload.filename,
+            models.FileUpload.uploaded_at,
+            models.FileUpload.uploader,
+            models.FileUpload.sha256,
+            models.FileUpload.size,
+            models.FileUpload.processing_status,
+            models.FileUpload.has_thumbnail,
+            models.FileUpload.item_id
+        )
+        .join(models.Item, models.FileUpload.item_id == models.Item.id)
+        .join(models.Category, models.Item.category_id == models.Category.id)
+        .where(models.Category.checklist_id.in_(checklist_ids))
+        .order_by(models.FileUpload.id)
+    )
+    for upload in uploads:
+        upload = dict(upload._mapping)
+        upload["has_thumbnail"] = bool(upload["has_thumbnail"])
+        by_item[upload.pop("item_id")].append(upload)
+    return trees
+
+
+def _checklist_rows():
+    """Select the checklist columns exposed by schemas.Checklist"""
+    return select(
+        models.Checklist.id,
+        models.Checklist.title,
+        models.Checklist.description,
+        models.Checklist.public_link,
+        models.Checklist.edit_token,
+        models.Checklist.created_at,
+        models.Checklist.category_count,
+        *(getattr(models.Checklist, name) for name in CATEGORY_COUNTERS)
+    )
+
+
+def get_checklist_tree(db: Session, checklist_id: int):
+    """Get a checklist by ID as a nested dict ready for JSON encoding"""
+    rows = db.execute(_checklist_rows().where(models.Checklist.id == checklist_id)).all()
+    trees = _checklist_trees(db, rows)
+    return trees[0] if trees else None
+
+
+def get_checklist_tree_by_edit_token(db: Session, edit_token: str):
+    """Get a checklist by its edit token as a nested dict ready for JSON encoding"""
+    rows = db.execute(_checklist_rows().where(models.Checklist.edit_token == edit_token)).all()
+    trees = _checklist_trees(db, rows)
+    return trees[0] if trees else None
+
+
+def get_checklist_trees(db: Session, skip: int = 0, limit: int = 100):
+    """Get checklists with pagination as nested dicts ready for JSON encoding"""
+    rows = db.execute(_checklist_rows().order_by(models.Checklist.id).offset(skip).limit(limit)).all()
+    return _checklist_trees(db, rows)
+
+
+def get_newest_checklist_trees(db: Session, limit: int):
+    """Get the newest checklists as ((public link, version), tree) pairs, for warming the public response cache"""
+    versions = dict(db.execute(
+        select(models.Checklist.id, models.Checklist.version).order_by(models.Checklist.id.desc()).limit(limit)
+    ).all())
+    if not versions:
+        return []
+    rows = db.execute(_checklist_rows().where(models.Checklist.id.in_(versions))).all()
+    return [((tree["public_link"], versions[tree["id"]]), tree) for tree in _checklist_trees(db, rows)]
+
+
+def get_checklist_summaries(db: Session, limit: int = 100, after: Optional[Tuple[datetime, int]] = None):
+    """Get checklist summaries with their stored completion counters, newest first
+
+    Keyset-paginated on (created_at, id): pass the last row's values as `after`
+    to get the next page, so deep pages cost the same as the first one.
+    """
+    query = _checklist_rows()
+    if after is not None:
+        query = query.where(tuple_(models.Checklist.created_at, models.Checklist.id) < tuple_(*after))
+    return db.execute(
+        query.order_by(models.Checklist.created_at.desc(), models.Checklist.id.desc()).limit(limit)
+    ).all()
+
+
+def _bump_version(db: Session, checklist_id):
+    """Bump a checklist's version; checklist_id may be a scalar subquery"""
+    db.execute(
+        update(models.Checklist)
+        .where(models.Checklist.id == checklist_id)
+        .values(version=models.Checklist.version + 1),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def _bump_versions(db: Session, checklist_ids):
+    """Bump the versions of several checklists; checklist_ids may be a subquery"""
+    db.execute(
+        update(models.Checklist)
+        .where(models.Checklist.id.in_(checklist_ids))
+        .values(version=models.Checklist.version + 1),
+        execution_options={"synchronize_session": False}
+    )
+
+
+# Completion counters. Categories count their items, completed items (with at
+# least one upload), uploads and upload bytes; checklists hold the sums over
+# their categories plus a category count. Uploads being added or removed
+# adjust them by difference; other tree changes recount the checklists
+# involved. reconcile_counters rebuilds them from scratch.
+CATEGORY_COUNTERS = ("item_count", "completed_item_count", "upload_count", "upload_bytes")
+
+
+def _category_counts():
+    """Correlated subqueries computing each counter of a category from its rows"""
+    in_category = models.Item.category_id == models.Category.id
+    uploads = select(models.FileUpload).join(models.Item, models.FileUpload.item_id == models.Item.id).where(in_category)
+    return {
+        "item_count": select(func.count(models.Item.id)).where(in_category).scalar_subquery(),
+        "completed_item_count": (
+            select(func.count(models.Item.id))
+            .where(in_category, exists().where(models.FileUpload.item_id == models.Item.id))
+            .scalar_subquery()
+        ),
+        "upload_count": uploads.with_only_columns(func.count(models.FileUpload.id)).scalar_subquery(),
+        "upload_bytes": uploads.with_only_columns(func.coalesce(func.sum(models.FileUpload.size), 0)).scalar_subquery(),
+    }
+
+
+def _checklist_counts():
+    """Correlated subqueries computing each counter of a checklist from its categories"""
+    in_checklist = models.Category.checklist_id == models.Checklist.id
+    counts = {
+        name: select(func.coalesce(func.sum(getattr(models.Category, name)), 0)).where(in_checklist).scalar_subquery()
+        for name in CATEGORY_COUNTERS
+    }
+    counts["category_count"] = select(func.count(models.Category.id)).where(in_checklist).scalar_subquery()
+    return counts
+
+
+def _recount(db: Session, checklist_ids):
+    """Recompute the counters of checklists and all their categories; checklist_ids may be a subquery
+
+    Call after the tree changes have been executed (or flushed), before committing.
+    """
+    db.execute(
+        update(models.Category)
+        .where(models.Category.checklist_id.in_(checklist_ids))
+        .values(**_category_counts()),
+        execution_options={"synchronize_session": False}
+    )
+    db.execute(
+        update(models.Checklist)
+        .where(models.Checklist.id.in_(checklist_ids))
+        .values(**_checklist_counts()),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def _count_upload_changes(db: Session, changes: List[tuple]):
+    """Adjust the counters for uploads added to or removed from items
+
+    `changes` holds (item_id, uploads, bytes) differences, negative for
+    removals, and must be applied after the upload rows were inserted or
+    deleted: an item's completion is decided by the uploads it has left.
+    """
+    uploads, sizes = Counter(), Counter()
+    for item_id, count, size in changes:
+        uploads[item_id] += count
+        sizes[item_id] += size or 0
+    remaining = (
+        select(func.count(models.FileUpload.id))
+        .where(models.FileUpload.item_id == models.Item.id)
+        .correlate(models.Item)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(models.Item.id, models.Item.category_id, models.Category.checklist_id, remaining.label("remaining"))
+        .join(models.Category, models.Item.category_id == models.Category.id)
+        .where(models.Item.id.in_(list(uploads)))
+    ).all()
+
+    by_category, by_checklist = {}, {}
+    for row in rows:
+        completed = (row.remaining > 0) - (row.remaining - uploads[row.id] > 0)
+        for totals, key in ((by_category, row.category_id), (by_checklist, row.checklist_id)):
+            total = totals.setdefault(key, [0, 0, 0])
+            total[0] += completed
+            total[1] += uploads[row.id]
+            total[2] += sizes[row.id]
+
+    for table, totals in ((models.Category.__table__, by_category), (models.Checklist.__table__, by_checklist)):
+        if totals:
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values(
+                    completed_item_count=table.c.completed_item_count + bindparam("completed"),
+                    upload_count=table.c.upload_count + bindparam("uploads"),
+                    upload_bytes=table.c.upload_bytes + bindparam("bytes")
+                ),
+                [
+                    {"row_id": key, "completed": completed, "uploads": count, "bytes": size}
+                    for key, (completed, count, size) in totals.items()
+                ]
+            )
+
+
+def reconcile_counters(db: Session, checklist_ids: Optional[List[int]] = None) -> List[int]:
+    """Rebuild the completion counters of the given checklists, or of all of them, and commit
+
+    Returns the ids of checklists whose stored counters, or those of one of
+    their categories, were out of date.
+    """
+    scope = select(models.Checklist.id)
+    if checklist_ids is not None:
+        scope = scope.where(models.Checklist.id.in_(checklist_ids))
+    checklist_columns = [getattr(models.Checklist, name) for name in ("category_count",) + CATEGORY_COUNTERS]
+    category_columns = [getattr(models.Category, name) for name in CATEGORY_COUNTERS]
+
+    def snapshot():
+        counts = {}
+        for row in db.execute(select(models.Checklist.id, *checklist_columns).where(models.Checklist.id.in_(scope))):
+            counts[row[0]] = [tuple(row[1:])]
+        for row in db.execute(
+            select(models.Category.checklist_id, models.Category.id, *category_columns)
+            .where(models.Category.checklist_id.in_(scope))
+            .order_by(models.Category.id)
+        ):
+            counts[row[0]].append(tuple(row[1:]))
+        return counts
+
+    before = snapshot()
+    _recount(db, scope)
+    after = snapshot()
+    db.commit()
+    return sorted(checklist_id for checklist_id, counts in after.items() if before[checklist_id] != counts)
+
+
+def _insert_category_tree(db: Session, checklist_id: int, categories: List[schemas.CategoryCreate]):
+    """Batch-insert categories and their items without committing"""
+    category_ids = _insert_categories(db, checklist_id, [category.name for category in categories])
+    _insert_items(db, [
+        (category_id, item)
+        for category_id, category in zip(category_ids, categories)
+        for item in category.items
+    ])
+    return category_ids
+
+
+def _insert_categories(db: Session, checklist_id: int, names: List[str]):
+    """Batch-insert categories without committing, returning their ids in order"""
+    if not names:
+        return []
+
+    # One executemany for all categories; RETURNING gives back the new ids in
+    # parameter order so items can be attached without a query per category
+    return db.execute(
+        insert(models.Category).returning(models.Category.id, sort_by_parameter_order=True),
+        [{"name": name, "checklist_id": checklist_id} for name in names]
+    ).scalars().all()
+
+
+def _insert_items(db: Session, items: List[tuple]):
+    """Batch-insert (category_id, ItemCreate) pairs without committing"""
+    if items:
+        db.execute(insert(models.Item), [
+            {
+                "name": item.name,
+                "allow_multiple_files": item.allow_multiple_files,
+                "category_id": category_id
+            }
+            for category_id, item in items
+        ])
+
+
+def _sync_categories(db: Session, checklist_id: int, categories: List[schemas.CategoryTreeUpdate]):
+    """Bring a checklist's categories and items in line with a submitted tree
+
+    Submitted categories and items are matched to stored rows by id; only rows
+    whose values changed are updated, ones without a (known) id are inserted
+    and stored ones that were left out are deleted along with their uploads.
+    Kept items keep their uploads. Does not commit; returns the Orphans of
+    the deleted uploads.
+    """
+    stored = dict(db.execute(
+        select(models.Category.id, models.Category.name)
+        .where(models.Category.checklist_id == checklist_id)
+    ).all())
+
+    # Resolve every submitted category to a stored id, or None if it is new
+    category_ids, renamed = [], []
+    for category in categories:
+        if category.id in stored and category.id not in category_ids:
+            category_ids.append(category.id)
+            if stored[category.id] != category.name:
+                renamed.append({"category_id": category.id, "new_name": category.name})
+        else:
+            category_ids.append(None)
+
+    if renamed:
+        db.execute(
+            update(models.Category.__table__)
+            .where(models.Category.id == bindparam("category_id"))
+            .values(name=bindparam("new_name")),
+            renamed
+        )
+
+    kept = set(category_ids)
+    new_ids = iter(_insert_categories(db, checklist_id, [
+        category.name for category_id, category in zip(category_ids, categories) if category_id is None
+    ]))
+    category_ids = [category_id if category_id is not None else next(new_ids) for category_id in category_ids]
+
+    # Items may move between categories of the same checklist, so they are
+    # matched against every item of the checklist rather than per category
+    orphaned = _sync_items(
+        db,
+        models.Item.category_id.in_(select(models.Category.id).where(models.Category.checklist_id == checklist_id)),
+        [(category_id, item) for category_id, category in zip(category_ids, categories) for item in category.items]
+    )
+
+    removed = [category_id for category_id in stored if category_id not in kept]
+    if removed:
+        # Their items were not submitted under any kept category, so they are gone already
+        db.execute(
+            delete(models.Category).where(models.Category.id.in_(removed)),
+            execution_options={"synchronize_session": False}
+        )
+    return orphaned
+
+
+def _sync_items(db: Session, scope, items: List[tuple]):
+    """Bring the items matching `scope` in line with submitted (category_id, ItemTreeUpdate) pairs
+
+    See _sync_categories. Does not commit; returns the Orphans of the deleted
+    uploads.
+    """
+    stored = {
+        row.id: (row.name, row.allow_multiple_files, row.category_id)
+        for row in db.execute(
+            select(models.Item.id, models.Item.name, models.Item.allow_multiple_files, models.Item.category_id)
+            .where(scope)
+        )
+    }
+
+    kept, changed, new = set(), [], []
+    for category_id, item in items:
+        if item.id not in stored or item.id in kept:
+            new.append((category_id, item))
+            continue
+        kept.add(item.id)
+        if stored[item.id] != (item.name, item.allow_multiple_files, category_id):
+            changed.append({
+                "item_id": item.id,
+                "new_name": item.name,
+                "new_allow_multiple_files": item.allow_multiple_files,
+                "new_category_id": category_id
+            })
+
+    if changed:
+        db.execute(
+            update(models.Item.__table__)
+            .where(models.Item.id == bindparam("item_id"))
+            .values(
+                name=bindparam("new_name"),
+                allow_multiple_files=bindparam("new_allow_multiple_files"),
+                category_id=bindparam("new_category_id")
+            ),
+            changed
+        )
+    _insert_items(db, new)
+
+    removed = [item_id for item_id in stored if item_id not in kept]
+    return _delete_items(db, models.Item.id.in_(removed)) if removed else NO_ORPHANS
+
+
+def _delete_items(db: Session, where):
+    """Set-based delete of the items matching `where`; the database cascades to their uploads
+
+    Returns the Orphans of their uploads, to remove once committed.
+    """
+    refs, paths = _upload_files(db, models.FileUpload.item_id.in_(select(models.Item.id).where(where)))
+    db.execute(delete(models.Item).where(where), execution_options={"synchronize_session": False})
+    return Orphans(paths, _release_blobs(db, refs))
+
+
+def _delete_cascading(db: Session, model, where, uploads, before_commit=None):
+    """Set-based delete of the `model` rows matching `where`, and commit
+
+    Their children go with them through ON DELETE CASCADE in the database, so
+    nothing is loaded into the session. `uploads` must match the file uploads
+    the cascade removes; their blob references are released in the same
+    transaction, as is anything `before_commit` (called with no arguments)
+    does, e.g. updating counters. Returns the Orphans of the deleted uploads,
+    to remove once committed, or None if no row matched.
+    """
+    refs, paths = _upload_files(db, uploads)
+    result = db.execute(delete(model).where(where), execution_options={"synchronize_session": False})
+    if result.rowcount == 0:
+        db.rollback()
+        return None
+    digests = _release_blobs(db, refs)
+    if before_commit is not None:
+        before_commit()
+    db.commit()
+    return Orphans(paths, digests)
+
+
+def _checklist_uploads(checklist_id: int):
+    """Filter matching the file uploads under a checklist"""
+    return models.FileUpload.item_id.in_(
+        select(models.Item.id)
+        .join(models.Category, models.Item.category_id == models.Category.id)
+        .where(models.Category.checklist_id == checklist_id)
+    )
+
+
+def _category_uploads(category_id: int):
+    """Filter matching the file uploads under a category"""
+    return models.FileUpload.item_id.in_(
+        select(models.Item.id).where(models.Item.category_id == category_id)
+    )
+
+
+def _category_positions(checklist_id: int):
+    """Subquery numbering a checklist's categories 1..n in id order"""
+    return (
+        select(
+            models.Category.id,
+            func.row_number().over(order_by=models.Category.id).label("position")
+        )
+        .where(models.Category.checklist_id == checklist_id)
+        .subquery()
+    )
 
 
 def create_checklist(db: Session, checklist: schemas.ChecklistCreate):
@@ -32,7 +620,8 @@ def create_checklist(db: Session, checklist: schemas.ChecklistCreate):
     public_link = str(uuid.uuid4())
     edit_token = str(uuid.uuid4())
     
-    # Create the checklist
+    # Create the checklist; flush only to get its id, the whole tree is
+    # written in a single transaction
     db_checklist = models.Checklist(
         title=checklist.title,
         description=checklist.description,
@@ -41,55 +630,142 @@ def create_checklist(db: Session, checklist: schemas.ChecklistCreate):
         created_at=datetime.utcnow()
     )
     db.add(db_checklist)
-    db.commit()
-    db.refresh(db_checklist)
+    db.flush()
     
     # Create categories and items
-    for category_data in checklist.categories:
-        create_category(db, category_data, db_checklist.id)
+    _insert_category_tree(db, db_checklist.id, checklist.categories)
+    _recount(db, [db_checklist.id])
+    db.commit()
     
-    return db_checklist
+    return get_checklist(db, db_checklist.id)
+
+
+def create_checklists(db: Session, checklists: List[schemas.ChecklistCreate]):
+    """Create many checklists with their categories and items in one transaction
+
+    Each level is a single executemany, whatever the number of checklists.
+    Returns (id, public_link, edit_token) rows in the order given.
+    """
+    if not checklists:
+        return []
+    created_at = datetime.utcnow()
+    rows = db.execute(
+        insert(models.Checklist).returning(
+            models.Checklist.id, models.Checklist.public_link, models.Checklist.edit_token,
+            sort_by_parameter_order=True
+        ),
+        [
+            {
+                "title": checklist.title,
+                "description": checklist.description,
+                "public_link": str(uuid.uuid4()),
+                "edit_token": str(uuid.uuid4()),
+                "created_at": created_at,
+            }
+            for checklist in checklists
+        ]
+    ).all()
+
+    categories = [
+        (row.id, category) for row, checklist in zip(rows, checklists) for category in checklist.categories
+    ]
+    if categories:
+        category_ids = db.execute(
+            insert(models.Category).returning(models.Category.id, sort_by_parameter_order=True),
+            [{"name": category.name, "checklist_id": checklist_id} for checklist_id, category in categories]
+        ).scalars().all()
+        _insert_items(db, [
+            (category_id, item)
+            for category_id, (_, category) in zip(category_ids, categories)
+            for item in category.items
+        ])
+    _recount(db, [row.id for row in rows])
+    db.commit()
+    return rows
+
+
+def iter_checklist_templates(db: Session, batch_size: int = 1000):
+    """Yield every checklist as a schemas.ChecklistCreate-shaped dict, in id order
+
+    The trees are assembled from one joined query whose rows are fetched
+    batch_size at a time, so memory use does not grow with the number of
+    checklists. Uploads and completion state are not part of a template.
+    """
+    rows = db.execute(
+        select(
+            models.Checklist.id,
+            models.Checklist.title,
+            models.Checklist.description,
+            models.Category.id.label("category_id"),
+            models.Category.name.label("category_name"),
+            models.Item.name.label("item_name"),
+            models.Item.allow_multiple_files,
+        )
+        .outerjoin(models.Category, models.Category.checklist_id == models.Checklist.id)
+        .outerjoin(models.Item, models.Item.category_id == models.Category.id)
+        .order_by(models.Checklist.id, models.Category.id, models.Item.id),
+        execution_options={"stream_results": True, "yield_per": batch_size}
+    )
+    checklist = checklist_id = category_id = items = None
+    for row in rows:
+        if row.id != checklist_id:
+            if checklist is not None:
+                yield checklist
+            checklist = {"title": row.title, "description": row.description, "categories": []}
+            checklist_id, category_id = row.id, None
+        if row.category_id is not None and row.category_id != category_id:
+            items = []
+            checklist["categories"].append({"name": row.category_name, "items": items})
+            category_id = row.category_id
+        if row.item_name is not None:
+            items.append({"name": row.item_name, "allow_multiple_files": row.allow_multiple_files})
+    if checklist is not None:
+        yield checklist
 
 
 def update_checklist(db: Session, checklist_id: int, checklist: schemas.ChecklistUpdate):
-    """Update a checklist's basic information"""
-    db_checklist = get_checklist(db, checklist_id)
+    """Update a checklist's basic information
+
+    Returns the updated checklist and the Orphans of the uploads it dropped,
+    to remove once committed, or None if the checklist does not exist.
+    """
+    # Just the row: the tree is synced from its ids, without loading uploads
+    db_checklist = db.get(models.Checklist, checklist_id)
     if db_checklist:
         # Update basic checklist info
         db_checklist.title = checklist.title
         if checklist.description is not None:
             db_checklist.description = checklist.description
         
+        _bump_version(db, checklist_id)
+        
         # Handle categories if provided
+        orphaned = NO_ORPHANS
         if checklist.categories is not None:
-            # Remove existing categories (cascade will remove items)
-            db.query(models.Category).filter(models.Category.checklist_id == checklist_id).delete()
-            db.commit()
-            
-            # Create new categories and items
-            for category_data in checklist.categories:
-                create_category(db, category_data, checklist_id)
+            # Apply only the differences; untouched items keep their uploads
+            orphaned = _sync_categories(db, checklist_id, checklist.categories)
+            _recount(db, [checklist_id])
         
         db.commit()
-        db.refresh(db_checklist)
-        return db_checklist
+        return get_checklist(db, checklist_id), orphaned
     return None
 
 
 def delete_checklist(db: Session, checklist_id: int):
-    """Delete a checklist and all its categories, items, and file uploads"""
-    db_checklist = get_checklist(db, checklist_id)
-    if db_checklist:
-        db.delete(db_checklist)
-        db.commit()
-        return True
-    return False
+    """Delete a checklist and all its categories, items, and file uploads
+
+    Returns the Orphans to remove once committed, or None if the
+    checklist does not exist.
+    """
+    return _delete_cascading(
+        db, models.Checklist, models.Checklist.id == checklist_id, _checklist_uploads(checklist_id)
+    )
 
 
 def clone_checklist(db: Session, checklist_id: int, new_title: Optional[str] = None):
     """Clone an existing checklist with all its categories and items"""
     # Get the original checklist
-    original = get_checklist(db, checklist_id=checklist_id)
+    original = db.get(models.Checklist, checklist_id)
     if not original:
         return None
     
@@ -102,92 +778,104 @@ def clone_checklist(db: Session, checklist_id: int, new_title: Optional[str] = N
         created_at=datetime.utcnow()
     )
     db.add(clone)
-    db.commit()
-    db.refresh(clone)
+    db.flush()
     
-    # Clone all categories and items
-    for category in original.categories:
-        db_category = models.Category(
-            name=category.name,
-            checklist_id=clone.id
-        )
-        db.add(db_category)
-        db.commit()
-        db.refresh(db_category)
-        
-        # Clone items within the category
-        for item in category.items:
-            db_item = models.Item(
-                name=item.name,
-                allow_multiple_files=item.allow_multiple_files,
-                category_id=db_category.id
-            )
-            db.add(db_item)
-        
-        db.commit()
+    # Copy categories with INSERT ... SELECT, in id order so the n-th new
+    # category corresponds to the n-th original one
+    db.execute(insert(models.Category).from_select(
+        ["name", "checklist_id"],
+        select(models.Category.name, literal(clone.id))
+        .where(models.Category.checklist_id == checklist_id)
+        .order_by(models.Category.id)
+    ))
     
-    return clone
+    # Copy items, pairing original and cloned categories by their position
+    source, target = _category_positions(checklist_id), _category_positions(clone.id)
+    db.execute(insert(models.Item).from_select(
+        ["name", "allow_multiple_files", "category_id"],
+        select(models.Item.name, models.Item.allow_multiple_files, target.c.id)
+        .select_from(models.Item)
+        .join(source, models.Item.category_id == source.c.id)
+        .join(target, source.c.position == target.c.position)
+        .order_by(models.Item.id)
+    ))
+    _recount(db, [clone.id])
+    db.commit()
+    
+    return get_checklist(db, clone.id)
 
 
 # Category operations
 def get_category(db: Session, category_id: int):
     """Get a category by ID"""
-    return db.query(models.Category).filter(models.Category.id == category_id).first()
+    return (
+        db.query(models.Category)
+        .options(selectinload(models.Category.items).selectinload(models.Item.uploads))
+        .filter(models.Category.id == category_id)
+        .first()
+    )
 
 
 def create_category(db: Session, category: schemas.CategoryCreate, checklist_id: int):
     """Create a new category with items"""
-    db_category = models.Category(
-        name=category.name,
-        checklist_id=checklist_id
-    )
-    db.add(db_category)
+    category_id, = _insert_category_tree(db, checklist_id, [category])
+    _bump_version(db, checklist_id)
+    _recount(db, [checklist_id])
     db.commit()
-    db.refresh(db_category)
     
-    # Create items
-    for item_data in category.items:
-        create_item(db, item_data, db_category.id)
-    
-    return db_category
+    return get_category(db, category_id)
 
 
 def update_category(db: Session, category_id: int, category: schemas.CategoryUpdate):
-    """Update a category's information"""
-    db_category = get_category(db, category_id)
+    """Update a category's information
+
+    Returns the updated category and the Orphans of the uploads it dropped,
+    to remove once committed, or None if the category does not exist.
+    """
+    db_category = db.get(models.Category, category_id)
     if db_category:
         db_category.name = category.name
+        _bump_version(db, db_category.checklist_id)
         
         # Handle items if provided
+        orphaned = NO_ORPHANS
         if category.items is not None:
-            # Remove existing items (cascade will remove file uploads)
-            db.query(models.Item).filter(models.Item.category_id == category_id).delete()
-            db.commit()
-            
-            # Create new items
-            for item_data in category.items:
-                create_item(db, item_data, category_id)
+            # Apply only the differences; untouched items keep their uploads
+            orphaned = _sync_items(
+                db,
+                models.Item.category_id == category_id,
+                [(category_id, item_data) for item_data in category.items]
+            )
+            _recount(db, [db_category.checklist_id])
         
         db.commit()
-        db.refresh(db_category)
-        return db_category
+        return get_category(db, category_id), orphaned
     return None
 
 
 def delete_category(db: Session, category_id: int):
-    """Delete a category and all its items and file uploads"""
-    db_category = get_category(db, category_id)
-    if db_category:
-        db.delete(db_category)
-        db.commit()
-        return True
-    return False
+    """Delete a category and all its items and file uploads
+
+    Returns the Orphans to remove once committed, or None if the
+    category does not exist.
+    """
+    checklist_id = db.scalar(select(_checklist_of_category(category_id)))
+    _bump_version(db, checklist_id)
+    return _delete_cascading(
+        db, models.Category, models.Category.id == category_id, _category_uploads(category_id),
+        before_commit=lambda: _recount(db, [checklist_id])
+    )
 
 
 # Item operations
 def get_item(db: Session, item_id: int):
     """Get an item by ID"""
-    return db.query(models.Item).filter(models.Item.id == item_id).first()
+    return (
+        db.query(models.Item)
+        .options(selectinload(models.Item.uploads))
+        .filter(models.Item.id == item_id)
+        .first()
+    )
 
 
 def create_item(db: Session, item: schemas.ItemCreate, category_id: int):
@@ -198,9 +886,11 @@ def create_item(db: Session, item: schemas.ItemCreate, category_id: int):
         category_id=category_id
     )
     db.add(db_item)
+    db.flush()
+    _bump_version(db, _checklist_of_category(category_id))
+    _recount(db, select(models.Category.checklist_id).where(models.Category.id == category_id))
     db.commit()
-    db.refresh(db_item)
-    return db_item
+    return get_item(db, db_item.id)
 
 
 def update_item(db: Session, item_id: int, item: schemas.ItemUpdate):
@@ -209,20 +899,24 @@ def update_item(db: Session, item_id: int, item: schemas.ItemUpdate):
     if db_item:
         db_item.name = item.name
         db_item.allow_multiple_files = item.allow_multiple_files
+        _bump_version(db, _checklist_of_item(item_id))
         db.commit()
-        db.refresh(db_item)
-        return db_item
+        return get_item(db, item_id)
     return None
 
 
 def delete_item(db: Session, item_id: int):
-    """Delete an item and all its file uploads"""
-    db_item = get_item(db, item_id)
-    if db_item:
-        db.delete(db_item)
-        db.commit()
-        return True
-    return False
+    """Delete an item and all its file uploads
+
+    Returns the Orphans to remove once committed, or None if the item
+    does not exist.
+    """
+    checklist_id = db.scalar(select(_checklist_of_item(item_id)))
+    _bump_version(db, checklist_id)
+    return _delete_cascading(
+        db, models.Item, models.Item.id == item_id, models.FileUpload.item_id == item_id,
+        before_commit=lambda: _recount(db, [checklist_id])
+    )
 
 
 # File upload operations
@@ -236,25 +930,501 @@ def get_file_uploads_by_item(db: Session, item_id: int):
     return db.query(models.FileUpload).filter(models.FileUpload.item_id == item_id).all()
 
 
-def create_file_upload(db: Session, file_upload: schemas.FileUploadCreate, item_id: int):
-    """Create a new file upload record"""
+def get_checklist_upload_entries(db: Session, checklist_id: int):
+    """Title of a checklist and one row per file upload under it, in tree order
+
+    Rows carry category_name, item_name, item_id, filename, sha256 and
+    uploaded_at. Returns None if the checklist does not exist.
+    """
+    title = db.execute(
+        select(models.Checklist.title).where(models.Checklist.id == checklist_id)
+    ).scalar_one_or_none()
+    if title is None:
+        return None
+    rows = db.execute(
+        select(
+            models.Category.name.label("category_name"),
+            models.Item.name.label("item_name"),
+            models.FileUpload.item_id,
+            models.FileUpload.filename,
+            models.FileUpload.sha256,
+            models.FileUpload.uploaded_at
+        )
+        .join(models.Item, models.Item.category_id == models.Category.id)
+        .join(models.FileUpload, models.FileUpload.item_id == models.Item.id)
+        .where(models.Category.checklist_id == checklist_id)
+        .order_by(models.Category.id, models.Item.id, models.FileUpload.id)
+    ).all()
+    return title, rows
+
+
+def get_upload_targets(db: Session, item_ids: List[int]):
+    """Map item id -> row of checklist_id, allow_multiple_files and upload_count"""
+    upload_count = (
+        select(func.count(models.FileUpload.id))
+        .where(models.FileUpload.item_id == models.Item.id)
+        .correlate(models.Item)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(
+            models.Item.id,
+            models.Category.checklist_id,
+            models.Item.allow_multiple_files,
+            upload_count.label("upload_count")
+        )
+        .join(models.Category, models.Item.category_id == models.Category.id)
+        .where(models.Item.id.in_(item_ids))
+    ).all()
+    return {row.id: row for row in rows}
+
+
+def create_file_upload(db: Session, file_upload: schemas.FileUploadCreate, item_id: int,
+                       staged: Optional[Dict[str, str]] = None):
+    """Create a new file upload record, referencing its stored blob
+
+    `staged` maps digests to files written by storage.store_stream. They are
+    published within the transaction, after the blob reference is taken: a
+    purge_blobs of the same blob either committed before, so its row and file
+    are gone and the file is published again, or waits for this transaction
+    and finds the blob referenced. Files published by a transaction that
+    fails to commit are removed again.
+    """
+    if file_upload.sha256 is not None:
+        _acquire_blobs(db, [(file_upload.sha256, 1)], {file_upload.sha256: file_upload.size})
     db_file = models.FileUpload(
         filename=file_upload.filename,
         uploaded_at=datetime.utcnow(),
         uploader=file_upload.uploader,
-        item_id=item_id
+        item_id=item_id,
+        sha256=file_upload.sha256,
+        size=file_upload.size
     )
     db.add(db_file)
-    db.commit()
+    db.flush()
+    _bump_version(db, _checklist_of_item(item_id))
+    _count_upload_changes(db, [(item_id, 1, file_upload.size)])
+    _commit_publishing(db, staged, {file_upload.sha256: file_upload.size})
     db.refresh(db_file)
     return db_file
 
 
+def create_file_uploads(db: Session, uploads: List[tuple], staged: Optional[Dict[str, str]] = None):
+    """Create file upload records for (item_id, FileUploadCreate) pairs in one transaction
+
+    `staged` is published as by create_file_upload. Returns the new records in
+    the order given.
+    """
+    if not uploads:
+        return []
+    refs, sizes = Counter(), {}
+    for _, file_upload in uploads:
+        if file_upload.sha256 is not None:
+            refs[file_upload.sha256] += 1
+            sizes[file_upload.sha256] = file_upload.size
+    _acquire_blobs(db, list(refs.items()), sizes)
+    
+    now = datetime.utcnow()
+    upload_ids = db.execute(
+        insert(models.FileUpload).returning(models.FileUpload.id, sort_by_parameter_order=True),
+        [
+            {
+                "filename": file_upload.filename,
+                "uploaded_at": now,
+                "uploader": file_upload.uploader,
+                "item_id": item_id,
+                "sha256": file_upload.sha256,
+                "size": file_upload.size
+            }
+            for item_id, file_upload in uploads
+        ]
+    ).scalars().all()
+    _count_upload_changes(db, [(item_id, 1, file_upload.size) for item_id, file_upload in uploads])
+    _bump_versions(db, (
+        select(models.Category.checklist_id)
+        .join(models.Item, models.Item.category_id == models.Category.id)
+        .where(models.Item.id.in_({item_id for item_id, _ in uploads}))
+    ))
+    _commit_publishing(db, staged, sizes)
+    
+    created = {
+        db_file.id: db_file
+        for db_file in db.query(models.FileUpload).filter(models.FileUpload.id.in_(upload_ids))
+    }
+    return [created[upload_id] for upload_id in upload_ids]
+
+
 def delete_file_upload(db: Session, file_id: int):
-    """Delete a file upload record"""
-    db_file = get_file_upload(db, file_id)
-    if db_file:
-        db.delete(db_file)
+    """Delete a file upload record, releasing its blob
+
+    Returns the Orphans to remove once committed (the blob if nothing else
+    references it, or a legacy file), or None if the upload does not exist.
+    """
+    upload = db.execute(
+        select(models.FileUpload.item_id, models.FileUpload.size).where(models.FileUpload.id == file_id)
+    ).first()
+    if upload is None:
+        return None
+    _bump_version(db, _checklist_of_upload(file_id))
+    return _delete_cascading(
+        db, models.FileUpload, models.FileUpload.id == file_id, models.FileUpload.id == file_id,
+        before_commit=lambda: _count_upload_changes(db, [(upload.item_id, -1, -(upload.size or 0))])
+    )
+
+
+# Full-text search, over the FTS5 tables that migration 0004 keeps in sync.
+# Each branch takes only its best `window` hits, which FTS5 finds without
+# ranking every match, before the branches are merged into one page.
+SEARCH_SQL = text("""
+SELECT hits.kind, hits.id, hits.checklist_id, checklists.title AS checklist_title, hits.snippet, hits.score AS rank
+FROM (
+    SELECT * FROM (
+        SELECT 'checklist' AS kind, checklists_fts.rowid AS id, checklists_fts.rowid AS checklist_id,
+               snippet(checklists_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet,
+               bm25(checklists_fts, 4.0, 1.0) AS score
+        FROM checklists_fts
+        WHERE checklists_fts MATCH :match
+        ORDER BY score LIMIT :window
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'category', categories.id, categories.checklist_id,
+               snippet(categories_fts, -1, '<mark>', '</mark>', '…', 16),
+               bm25(categories_fts, 2.0) AS score
+        FROM categories_fts
+        JOIN categories ON categories.id = categories_fts.rowid
+        WHERE categories_fts MATCH :match
+        ORDER BY score LIMIT :window
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'item', items.id, categories.checklist_id,
+               snippet(items_fts, -1, '<mark>', '</mark>', '…', 16),
+               bm25(items_fts, 2.0) AS score
+        FROM items_fts
+        JOIN items ON items.id = items_fts.rowid
+        JOIN categories ON categories.id = items.category_id
+        WHERE items_fts MATCH :match
+        ORDER BY score LIMIT :window
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'upload', file_uploads.id, categories.checklist_id,
+               snippet(file_uploads_fts, -1, '<mark>', '</mark>', '…', 16),
+               bm25(file_uploads_fts, 2.0, 1.0) AS score
+        FROM file_uploads_fts
+        JOIN file_uploads ON file_uploads.id = file_uploads_fts.rowid
+        JOIN items ON items.id = file_uploads.item_id
+        JOIN categories ON categories.id = items.category_id
+        WHERE file_uploads_fts MATCH :match
+        ORDER BY score LIMIT :window
+    )
+) AS hits
+JOIN checklists ON checklists.id = hits.checklist_id
+ORDER BY hits.score, hits.kind, hits.id
+LIMIT :limit OFFSET :offset
+""")
+
+
+SEARCH_MIN_PREFIX = 3  # Matches the prefix index built by migration 0004
+
+
+class SearchUnavailable(Exception):
+    """Raised when the database has no full-text search index"""
+
+
+def _fts_query(query: str) -> str:
+    """FTS5 query matching every word of a user's query, the last one as a prefix
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    matched literally instead of causing syntax errors. Prefixes shorter than
+    SEARCH_MIN_PREFIX match whole words only, as they would match (and rank)
+    a large share of the index.
+    """
+    words = query.split()
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    if terms and len(words[-1]) >= SEARCH_MIN_PREFIX:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(db: Session, query: str, limit: int = 20, offset: int = 0):
+    """Ranked hits for query across checklists, categories, items and uploads
+
+    Returns up to limit + 1 hit dicts, so callers can tell whether there is a
+    next page.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        raise SearchUnavailable("Search needs the SQLite FTS5 index")
+    match = _fts_query(query)
+    if not match:
+        return []
+    rows = db.execute(SEARCH_SQL, {
+        "match": match,
+        "window": offset + limit + 1,
+        "limit": limit + 1,
+        "offset": offset
+    }).mappings().all()
+    return [dict(row) for row in rows]
+
+
+# Upload processing
+def _claimable(lease_seconds: int, include_pending: bool = True):
+    """Filter matching uploads a job queue may claim: pending ones, and ones whose processing outlived its lease"""
+    cutoff = datetime.utcnow() - timedelta(seconds=lease_seconds)
+    abandoned = and_(
+        models.FileUpload.processing_status == "processing",
+        or_(models.FileUpload.processing_started_at.is_(None), models.FileUpload.processing_started_at < cutoff)
+    )
+    if not include_pending:
+        return abandoned
+    return or_(models.FileUpload.processing_status == "pending", abandoned)
+
+
+def get_unprocessed_upload_ids(db: Session, lease_seconds: int, include_pending: bool = True):
+    """Ids of the uploads waiting for processing, or abandoned during it by a worker whose lease ran out"""
+    return db.execute(
+        select(models.FileUpload.id)
+        .where(_claimable(lease_seconds, include_pending))
+        .order_by(models.FileUpload.id)
+    ).scalars().all()
+
+
+def count_unprocessed_uploads(db: Session) -> int:
+    """Number of uploads waiting for or undergoing processing"""
+    return db.execute(
+        select(func.count(models.FileUpload.id))
+        .where(models.FileUpload.processing_status.in_(("pending", "processing")))
+    ).scalar_one()
+
+
+def start_upload_processing(db: Session, file_id: int, lease_seconds: int):
+    """Claim an upload for processing and return its id, sha256, item_id and filename
+
+    The claim is a single conditional UPDATE, so of several job queues
+    starting on the same upload only one gets it. Returns None when there is
+    nothing to do: the upload is gone, already processed, claimed by another
+    queue whose lease has not run out, or its content was processed for
+    another upload, whose results are then copied over.
+    """
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(models.FileUpload)
+        .where(models.FileUpload.id == file_id, _claimable(lease_seconds))
+        .values(processing_status="processing", processing_started_at=now),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    if claimed != 1:
+        db.rollback()
+        return None
+
+    upload = db.execute(
+        select(
+            models.FileUpload.id,
+            models.FileUpload.sha256,
+            models.FileUpload.item_id,
+            models.FileUpload.filename
+        ).where(models.FileUpload.id == file_id)
+    ).first()
+
+    if upload.sha256 is not None:
+        # Same content and same kind of file gives the same results
+        extension = upload.filename.rsplit(".", 1)[-1].lower()
+        done = db.execute(
+            select(models.FileUpload.extracted_text, models.FileUpload.has_thumbnail)
+            .where(
+                models.FileUpload.sha256 == upload.sha256,
+                models.FileUpload.processing_status == "done",
+                func.lower(models.FileUpload.filename).like(f"%.{extension}")
+            )
+            .limit(1)
+        ).first()
+        if done is not None:
+            _finish_processing(db, file_id, "done", text=done.extracted_text, has_thumbnail=done.has_thumbnail)
+            return None
+
+    db.commit()
+    return upload
+
+
+def finish_upload_processing(db: Session, file_id: int, text: Optional[str] = None,
+                             has_thumbnail: bool = False, error: Optional[str] = None):
+    """Store an upload's processing results, or the error that stopped it"""
+    _finish_processing(db, file_id, "failed" if error else "done", text, has_thumbnail, error)
+
+
+def _finish_processing(db: Session, file_id: int, status: str, text: Optional[str] = None,
+                       has_thumbnail: bool = False, error: Optional[str] = None):
+    """Record the outcome of processing an upload and commit"""
+    db.execute(
+        update(models.FileUpload)
+        .where(models.FileUpload.id == file_id)
+        .values(
+            processing_status=status,
+            processing_error=error,
+            processed_at=datetime.utcnow(),
+            extracted_text=text,
+            has_thumbnail=has_thumbnail
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    # The checklist views show processing status and thumbnails
+    _bump_version(db, _checklist_of_upload(file_id))
+    db.commit()
+
+
+def get_upload_processing(db: Session, file_id: int):
+    """Processing state of an upload as a dict for schemas.UploadProcessing, or None"""
+    row = db.execute(
+        select(
+            models.FileUpload.id,
+            models.FileUpload.processing_status,
+            models.FileUpload.processing_error,
+            models.FileUpload.processed_at,
+            models.FileUpload.has_thumbnail,
+            func.length(models.FileUpload.extracted_text)
+        ).where(models.FileUpload.id == file_id)
+    ).first()
+    if row is None:
+        return None
+    file_id, status, error, processed_at, has_thumbnail, text_length = row
+    return {
+        "file_id": file_id,
+        "status": status,
+        "error": error,
+        "processed_at": processed_at,
+        "has_thumbnail": bool(has_thumbnail),
+        "text_length": text_length
+    }
+
+
+def get_upload_text(db: Session, file_id: int):
+    """Text extracted from an upload, or None if the upload does not exist
+
+    Uploads without extracted text give an empty string.
+    """
+    row = db.execute(
+        select(models.FileUpload.extracted_text).where(models.FileUpload.id == file_id)
+    ).first()
+    if row is None:
+        return None
+    return row.extracted_text or ""
+
+
+# Blob reference counting
+def _blob_insert(db: Session):
+    """INSERT into blobs in the database's dialect, which has ON CONFLICT"""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(models.Blob.__table__)
+
+
+def _acquire_blobs(db: Session, refs, sizes):
+    """Add (digest, count) blob references in bulk, creating rows for new blobs
+
+    A single INSERT ... ON CONFLICT DO UPDATE, so concurrent uploads of the
+    same content cannot both try to create its row, and one racing a
+    purge_blobs of that row waits for the purge to commit.
+    """
+    if not refs:
+        return
+    stmt = _blob_insert(db)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.Blob.sha256],
+            set_={"ref_count": models.Blob.__table__.c.ref_count + stmt.excluded.ref_count}
+        ),
+        [{"sha256": digest, "size": sizes[digest], "ref_count": count} for digest, count in refs]
+    )
+
+
+def _commit_publishing(db: Session, staged: Optional[Dict[str, str]], sizes):
+    """Move staged upload files to their blob paths and commit; call holding the blobs' references
+
+    If the commit fails, the files this put in place are referenced by nothing,
+    so they are purged again under the blobs' lock, as purge_blobs does: a
+    blob that an upload of the same content has meanwhile committed a
+    reference to is kept.
+    """
+    published = [digest for digest, tmp_path in (staged or {}).items() if storage.publish_blob(tmp_path, digest)]
+    try:
         db.commit()
-        return True
-    return False
+    except Exception:
+        db.rollback()
+        if published:
+            try:
+                _acquire_blobs(db, [(digest, 0) for digest in published], sizes)
+                purge_blobs(db, published)
+            except Exception:
+                db.rollback()
+                logger.exception("Removing blobs published by a failed commit failed: %s", ", ".join(published))
+        raise
+
+
+def _upload_files(db: Session, uploads):
+    """Files held by the file uploads matching `uploads`, in one query
+
+    Returns their (digest, count) blob references and the paths of their
+    legacy files.
+    """
+    rows = db.execute(
+        select(models.FileUpload.sha256, models.FileUpload.item_id, models.FileUpload.filename).where(uploads)
+    ).all()
+    refs = Counter(row.sha256 for row in rows if row.sha256 is not None)
+    legacy = [storage.legacy_path(row.item_id, row.filename) for row in rows if row.sha256 is None]
+    return list(refs.items()), legacy
+
+
+def _blob_files(digests):
+    """Paths of the files stored for blobs: their content and any thumbnail"""
+    return [path for digest in digests for path in (storage.blob_path(digest), storage.thumbnail_path(digest))]
+
+
+def _release_blobs(db: Session, refs):
+    """Drop (digest, count) blob references; returns digests of blobs now unreferenced
+
+    Must run after the referencing upload rows are deleted. The returned blobs
+    keep their rows, so the purge_blobs that removes them once committed can
+    tell whether an upload took them up again in the meantime.
+    """
+    if not refs:
+        return []
+    blobs = models.Blob.__table__
+    db.execute(
+        update(blobs)
+        .where(blobs.c.sha256 == bindparam("digest"))
+        .values(ref_count=blobs.c.ref_count - bindparam("count")),
+        [{"digest": digest, "count": count} for digest, count in refs]
+    )
+    digests = [digest for digest, _ in refs]
+    return db.execute(
+        select(blobs.c.sha256).where(blobs.c.sha256.in_(digests), blobs.c.ref_count <= 0)
+    ).scalars().all()
+
+
+def purge_blobs(db: Session, digests: List[str]):
+    """Delete the blobs among `digests` that are still unreferenced, rows and files, and commit
+
+    Their files are removed before the row deletion commits, so an upload of
+    the same content waits for it in _acquire_blobs and then publishes the
+    file again. Returns the digests of the blobs deleted.
+    """
+    if not digests:
+        return []
+    blobs = models.Blob.__table__
+    purged = db.execute(
+        delete(blobs).where(blobs.c.sha256.in_(digests), blobs.c.ref_count <= 0).returning(blobs.c.sha256)
+    ).scalars().all()
+    storage.delete_files(_blob_files(purged))
+    db.commit()
+    return purged
+
+
+def remove_orphans(orphans: Orphans):
+    """Remove the files a committed change left unreferenced, in a session of its own
+
+    Blocking; routers run it as a background task once the response is sent.
+    """
+    storage.delete_files(orphans.paths)
+    if orphans.digests:
+        with SessionLocal() as db:
+            purge_blobs(db, orphans.digests)
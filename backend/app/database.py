@@ -1,20 +1,179 @@
-from sqlalchemy import create_engine
+from typing import TYPE_CHECKING, Union
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from . import config
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+# Async drivers for the sync URLs we know how to translate
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """The async-driver equivalent of a sync database URL"""
+    parsed = make_url(url)
+    parsed = parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+    return parsed.render_as_string(hide_password=False)
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each new SQLite connection: WAL lets readers run alongside the writer"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size = {config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA foreign_keys = {'ON' if config.SQLITE_FOREIGN_KEYS else 'OFF'}")
+    cursor.close()
+
+
+def engine_options(url: str) -> dict:
+    """create_engine keyword arguments for url, from the pool settings in config"""
+    parsed = make_url(url)
+    options = {}
+    if parsed.get_backend_name() == "sqlite":
+        if not parsed.drivername.endswith("aiosqlite"):
+            options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(parsed):
+            return options
+    else:
+        options["pool_pre_ping"] = config.DB_POOL_PRE_PING
+    options.update(
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def configure_engine(engine):
+    """Attach dialect-specific connection setup to a sync engine"""
+    if engine.dialect.name == "sqlite" and not _is_memory_sqlite(engine.url):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def create_db_engine(url: str):
+    """Create a sync engine for url, pooled and tuned per dialect"""
+    return configure_engine(create_engine(url, **engine_options(url)))
+
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./checklist.db"
+def create_async_db_engine(url: str):
+    """Create an async engine for url, pooled and tuned per dialect"""
+    # Imported lazily: sqlalchemy.ext.asyncio needs greenlet and an async
+    # driver, which the sync mode does not
+    from sqlalchemy.ext.asyncio import create_async_engine
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+    async_engine = create_async_engine(url, **engine_options(url))
+    configure_engine(async_engine.sync_engine)
+    return async_engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Serve requests through an async engine so concurrency is bounded by I/O
+# rather than by the threadpool; the sync engine stays available for scripts
+# and the default mode.
+USE_ASYNC_DB = config.USE_ASYNC_DB
+async_engine = None
+AsyncSessionLocal = None
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # crud functions reload whatever they return after committing, so objects
+    # handed back through run_db are fully loaded and never lazy-load outside it
+    async_engine = create_async_db_engine(config.ASYNC_DATABASE_URL or async_url(SQLALCHEMY_DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+DbSession = Union[Session, "AsyncSession"]
+
+
+async def get_db():
+    """Yield a database session for a request: async or sync depending on USE_ASYNC_DB"""
+    if USE_ASYNC_DB:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def run_db(db: DbSession, fn, *args, **kwargs):
+    """Run a sync crud function against either session flavour without blocking the event loop
+
+    AsyncSession runs it on the event loop with awaited, non-blocking I/O;
+    a sync Session runs it in the threadpool. The session is closed afterwards
+    so its connection goes back to the pool instead of being held while the
+    request awaits other work; returned objects stay loaded but detached.
+    """
+    if USE_ASYNC_DB:
+        try:
+            return await db.run_sync(fn, *args, **kwargs)
+        finally:
+            await db.close()
+
+    def call():
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(call)
+
+
+async def run_in_session(fn, *args, **kwargs):
+    """Run a sync crud function in a session of its own, for code outside request dependencies"""
+    db = AsyncSessionLocal() if USE_ASYNC_DB else SessionLocal()
+    return await run_db(db, fn, *args, **kwargs)
+
+
+async def warm_pool(connections: int):
+    """Open pooled connections ahead of the first requests, so they do not pay for connecting
+
+    All are held at once so the pool keeps that many, capped by its size.
+    """
+    if USE_ASYNC_DB:
+        opened = []
+        try:
+            for _ in range(connections):
+                opened.append(await async_engine.connect())
+                await opened[-1].exec_driver_sql("SELECT 1")
+        finally:
+            for connection in opened:
+                await connection.close()
+        return
+
+    def warm():
+        opened = []
+        try:
+            for _ in range(connections):
+                opened.append(engine.connect())
+                opened[-1].exec_driver_sql("SELECT 1")
+        finally:
+            for connection in opened:
+                connection.close()
 
+    await run_in_threadpool(warm)
@@ -0,0 +1,148 @@
+import asyncio
+import itertools
+from typing import Dict, Optional, Set
+
+from . import config, crud, serializers
+from .database import run_in_session
+
+# Live updates for viewers of a checklist, pushed over Server-Sent Events (see
+# GET /checklists/public/{public_link}/events). Routers and the job queue
+# publish small deltas after their changes commit:
+#
+#   upload_added      {item_id, upload}        upload_removed   {item_id, upload_id}
+#   upload_processed  {item_id, upload_id, processing_status, has_thumbnail}
+#   item_added        {category_id, item}      item_updated     {item_id, name, allow_multiple_files}
+#   item_removed      {item_id}                checklist_changed {}  (re-fetch the tree)
+#   checklist_deleted {}
+#
+# A subscriber that falls behind gets a single "resync" event in place of
+# what it missed, telling it to re-fetch the checklist. The hub lives in
+# this process, so with several worker processes a viewer only sees changes
+# made through the worker serving its stream.
+
+
+class TooManySubscribers(Exception):
+    """Raised when the hub is at its subscriber limit"""
+
+
+class Subscription:
+    """One viewer's stream: a bounded queue of encoded events"""
+
+    def __init__(self, checklist_id: int, queue_size: int):
+        self.checklist_id = checklist_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+
+class EventHub:
+    """In-process publish/subscribe of checklist events
+
+    publish never blocks or awaits, so it is safe to call from request
+    handlers; it must be called on the event loop thread.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._ids = itertools.count(1)
+        self.count = 0
+        self.published = 0
+        self.overflows = 0
+
+    @property
+    def active(self) -> bool:
+        """Whether anyone is listening at all; lets publishers skip looking up checklist ids"""
+        return self.count > 0
+
+    def subscribe(self, checklist_id: int) -> Subscription:
+        if self.count >= self.max_subscribers:
+            raise TooManySubscribers(f"At most {self.max_subscribers} event streams can be open")
+        subscription = Subscription(checklist_id, self.queue_size)
+        self._subscribers.setdefault(checklist_id, set()).add(subscription)
+        self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.checklist_id)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.checklist_id]
+        self.count -= 1
+
+    def publish(self, checklist_id: Optional[int], event_type: str, **data):
+        """Send an event to everyone watching a checklist; a no-op for None or no subscribers"""
+        subscribers = self._subscribers.get(checklist_id) if checklist_id is not None else None
+        if not subscribers:
+            return
+        message = encode(event_type, data, next(self._ids))
+        self.published += 1
+        for subscription in subscribers:
+            self._offer(subscription, message)
+        if event_type == "checklist_deleted":
+            for subscription in list(subscribers):
+                subscription.closed = True
+                self.unsubscribe(subscription)
+
+    def _offer(self, subscription: Subscription, message: bytes):
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Drop the backlog rather than block publishers or grow without
+            # bound; the viewer re-fetches instead of replaying it
+            self.overflows += 1
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(encode("resync", {}, next(self._ids)))
+
+
+def encode(event_type: str, data: dict, event_id: int) -> bytes:
+    """One Server-Sent Events message"""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event_type.encode(), serializers.dumps(data))
+
+
+async def stream(subscription: Subscription, hub: "EventHub", heartbeat: float):
+    """Yield a subscription's events as SSE bytes, with a comment line whenever it is idle
+
+    Unsubscribes when the client goes away and the generator is closed.
+    """
+    try:
+        yield b"retry: %d\n\n" % (config.EVENTS_RETRY_MS,)
+        while not subscription.closed or not subscription.queue.empty():
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection and reveals dead clients
+                yield b": heartbeat\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def checklist_of(kind: str, resource_id: int) -> Optional[int]:
+    """Id of the checklist owning a resource, or None when nobody is subscribed to anything
+
+    Call before the change, as deleted resources can no longer be traced.
+    """
+    if not hub.active:
+        return None
+    return await run_in_session(crud.get_owning_checklist_id, kind, resource_id)
+
+
+def upload_fields(upload) -> dict:
+    """The schemas.FileUpload fields of an upload, for event payloads"""
+    return {
+        "id": upload.id,
+        "filename": upload.filename,
+        "uploaded_at": upload.uploaded_at,
+        "uploader": upload.uploader,
+        "sha256": upload.sha256,
+        "size": upload.size,
+        "processing_status": upload.processing_status,
+        "has_thumbnail": bool(upload.has_thumbnail),
+    }
+
+
+# The application's hub
+hub = EventHub(queue_size=config.EVENTS_QUEUE_SIZE, max_subscribers=config.EVENTS_MAX_SUBSCRIBERS)
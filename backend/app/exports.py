@@ -0,0 +1,93 @@
+import os
+import zipfile
+from typing import Iterable, Iterator
+
+from . import storage
+
+# Formats that are already compressed are stored as-is; deflating them would
+# only cost CPU
+STORED_EXTENSIONS = {".pdf", ".xlsx", ".docx", ".zip", ".png", ".jpg", ".jpeg", ".gif"}
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object holding what ZipFile writes until drained
+
+    Because it cannot tell or seek, ZipFile writes sizes and checksums in data
+    descriptors after each member instead of going back to patch headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def safe_name(name: str) -> str:
+    """Archive path component that cannot add directories or escape the archive"""
+    name = name.replace("/", "_").replace("\\", "_").strip().lstrip(".")
+    return name or "_"
+
+
+def _unique(name: str, taken: set) -> str:
+    """name, or name with a counter before its extension if it is already taken"""
+    candidate, n = name, 1
+    stem, extension = os.path.splitext(name)
+    while candidate in taken:
+        n += 1
+        candidate = f"{stem} ({n}){extension}"
+    taken.add(candidate)
+    return candidate
+
+
+def zip_uploads(entries: Iterable) -> Iterator[bytes]:
+    """Stream a ZIP archive of uploads laid out as category/item/filename
+
+    entries are rows as returned by crud.get_checklist_upload_entries. The
+    archive is produced as it is read: each file is copied in
+    storage.CHUNK_SIZE pieces and every piece is yielded before the next is
+    read, so memory stays constant whatever the export size and a slow client
+    slows down reading rather than filling buffers. Uploads whose content is
+    missing from disk are skipped. Blocking; iterate it from a worker thread.
+    """
+    sink = _ChunkSink()
+    taken = set()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for entry in entries:
+            path = storage.upload_path(entry.sha256, entry.item_id, entry.filename)
+            try:
+                source = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with source:
+                size = os.fstat(source.fileno()).st_size
+                name = _unique("/".join(
+                    safe_name(part) for part in (entry.category_name, entry.item_name, entry.filename)
+                ), taken)
+                info = zipfile.ZipInfo(name)
+                if entry.uploaded_at is not None:
+                    info.date_time = entry.uploaded_at.timetuple()[:6]
+                if os.path.splitext(entry.filename)[1].lower() in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as member:
+                    while True:
+                        chunk = source.read(storage.CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        member.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            yield sink.drain()
+    yield sink.drain()
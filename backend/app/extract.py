@@ -0,0 +1,115 @@
+import os
+import tempfile
+import zipfile
+from typing import Optional, Tuple
+from xml.etree import ElementTree
+
+# Derived data for uploaded files: text to search and a preview image for
+# PDFs. These functions run in job worker processes (see jobs.py), so they
+# only touch the file system. PDFs need the optional pypdfium2 and Pillow
+# packages; without them PDFs get neither text nor a thumbnail.
+
+THUMBNAIL_WIDTH = 240  # Pixels
+TEXT_READ_SIZE = 64 * 1024  # Bytes of a text file decoded at once
+
+
+def extract(path: str, filename: str, thumbnail_path: Optional[str], max_chars: int) -> dict:
+    """Extract text from the file at path, and render a thumbnail of PDFs to thumbnail_path
+
+    Returns {"text": str or None, "has_thumbnail": bool}. Text is cut off
+    after max_chars characters.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    text, has_thumbnail = None, False
+    if extension == ".txt":
+        text = _text_file(path, max_chars)
+    elif extension == ".xlsx":
+        text = _xlsx_text(path, max_chars)
+    elif extension == ".pdf":
+        text, has_thumbnail = _pdf(path, thumbnail_path, max_chars)
+    return {"text": text, "has_thumbnail": has_thumbnail}
+
+
+def _text_file(path: str, max_chars: int) -> str:
+    """Text of a plain text file, decoded as UTF-8 with replacement characters"""
+    parts, size = [], 0
+    with open(path, encoding="utf-8", errors="replace") as source:
+        while size < max_chars:
+            part = source.read(min(TEXT_READ_SIZE, max_chars - size))
+            if not part:
+                break
+            parts.append(part)
+            size += len(part)
+    return "".join(parts)
+
+
+def _xlsx_text(path: str, max_chars: int) -> str:
+    """Strings of a workbook: its shared strings table and inline cell strings
+
+    An .xlsx file is a ZIP of XML parts, so this needs no spreadsheet library.
+    Numeric cells are left out.
+    """
+    parts, size = [], 0
+    with zipfile.ZipFile(path) as workbook:
+        names = [
+            name for name in workbook.namelist()
+            if name == "xl/sharedStrings.xml" or (name.startswith("xl/worksheets/") and name.endswith(".xml"))
+        ]
+        for name in names:
+            with workbook.open(name) as member:
+                for _, element in ElementTree.iterparse(member):
+                    # <t> holds text both in shared strings and inline strings
+                    if element.tag.endswith("}t") and element.text:
+                        parts.append(element.text)
+                        size += len(element.text) + 1
+                        if size >= max_chars:
+                            return "\n".join(parts)[:max_chars]
+                    element.clear()
+    return "\n".join(parts)
+
+
+def _pdf(path: str, thumbnail_path: Optional[str], max_chars: int) -> Tuple[Optional[str], bool]:
+    """Text of a PDF and whether a first-page thumbnail was written"""
+    try:
+        import pypdfium2
+    except ImportError:
+        return None, False
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        parts, size = [], 0
+        for index in range(len(pdf)):
+            page = pdf[index]
+            text = page.get_textpage().get_text_range()
+            parts.append(text)
+            size += len(text)
+            if size >= max_chars:
+                break
+        text = "\n".join(parts)[:max_chars]
+
+        has_thumbnail = False
+        if thumbnail_path is not None and len(pdf):
+            has_thumbnail = _render_thumbnail(pdf[0], thumbnail_path)
+        return text, has_thumbnail
+    finally:
+        pdf.close()
+
+
+def _render_thumbnail(page, thumbnail_path: str) -> bool:
+    """Render a PDF page as a PNG at THUMBNAIL_WIDTH, written atomically"""
+    try:
+        image = page.render(scale=THUMBNAIL_WIDTH / page.get_width()).to_pil()
+    except ImportError:  # Pillow is missing
+        return False
+    directory = os.path.dirname(thumbnail_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".thumbnail-")
+    try:
+        with os.fdopen(fd, "wb") as target:
+            image.save(target, format="PNG")
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, thumbnail_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Optional
+
+from . import config, crud, events, extract, storage
+from .database import run_in_session
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Background processing of committed uploads, without an external broker
+
+    Upload ids wait in an in-memory asyncio queue; worker tasks take them one
+    at a time and hand the file to a process pool for extraction, so parsing
+    never blocks the event loop or competes for the API process's GIL.
+    Progress lives on the FileUpload (processing_status), which also makes the
+    queue durable: uploads still pending when the process stops are queued
+    again by the next start(). Queues in several processes share the work by
+    claiming uploads in the database; one abandoned mid-processing is queued
+    again once its lease (JOB_LEASE_SECONDS) has run out.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._executor = None
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _process_pool(self):
+        # spawn rather than fork: the API process runs threads and an event loop
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def start(self):
+        """Start the workers and queue every upload left unprocessed"""
+        if self.running:
+            return
+        if self.workers > 0:
+            self._executor = self._process_pool()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(max(self.workers, 1))]
+        self._tasks.append(asyncio.create_task(self._requeue_abandoned()))
+        self.enqueue(await run_in_session(crud.get_unprocessed_upload_ids, config.JOB_LEASE_SECONDS))
+
+    async def stop(self):
+        """Stop the workers; queued uploads stay pending until the next start"""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._queue, self._tasks, self._executor = None, [], None
+
+    def enqueue(self, file_ids: Iterable[int]):
+        """Queue uploads for processing; a no-op while stopped, as start() picks them up"""
+        if self._queue is not None:
+            for file_id in file_ids:
+                self._queue.put_nowait(file_id)
+
+    async def join(self):
+        """Wait until every queued upload has been processed"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _work(self):
+        while True:
+            file_id = await self._queue.get()
+            try:
+                await self._process(file_id)
+            except Exception:
+                logger.exception("Processing upload %s failed", file_id)
+            finally:
+                self._queue.task_done()
+
+    async def _requeue_abandoned(self):
+        """Every lease period, queue the uploads whose processing outlived its lease"""
+        while True:
+            await asyncio.sleep(config.JOB_LEASE_SECONDS)
+            try:
+                self.enqueue(await run_in_session(
+                    crud.get_unprocessed_upload_ids, config.JOB_LEASE_SECONDS, include_pending=False
+                ))
+            except Exception:
+                logger.exception("Looking for abandoned uploads failed")
+
+    async def _process(self, file_id: int):
+        upload = await run_in_session(crud.start_upload_processing, file_id, config.JOB_LEASE_SECONDS)
+        if upload is None:
+            # Gone, done, or claimed elsewhere, possibly just now by reusing another upload's results
+            if events.hub.active:
+                done = await run_in_session(crud.get_file_upload, file_id)
+                if done is not None and done.processing_status == "done":
+                    await self._published(done, "done", bool(done.has_thumbnail))
+            return
+        path = storage.upload_path(upload.sha256, upload.item_id, upload.filename)
+        thumbnail = storage.thumbnail_path(upload.sha256) if upload.sha256 else None
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, extract.extract, path, upload.filename, thumbnail, config.EXTRACTED_TEXT_MAX_CHARS
+            )
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A worker process died (e.g. killed for memory); replace the pool
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._process_pool()
+            await run_in_session(crud.finish_upload_processing, file_id, error=f"{type(e).__name__}: {e}")
+            await self._published(upload, "failed", False)
+            return
+        await run_in_session(
+            crud.finish_upload_processing, file_id, text=result["text"], has_thumbnail=result["has_thumbnail"]
+        )
+        await self._published(upload, "done", result["has_thumbnail"])
+
+    async def _published(self, upload, status: str, has_thumbnail: bool):
+        """Tell live viewers of the upload's checklist that it has been processed"""
+        events.hub.publish(
+            await events.checklist_of("upload", upload.id), "upload_processed",
+            item_id=upload.item_id, upload_id=upload.id, processing_status=status, has_thumbnail=has_thumbnail
+        )
+
+
+# The application's queue, started and stopped with the app (see main.py)
+queue = JobQueue(workers=config.JOB_WORKERS)
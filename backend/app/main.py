@@ -1,40 +1,64 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-import os
 
-from .api import checklist, files
-from . import models
-from .database import engine
+from . import config, jobs, startup
+from .admission import AdmissionMiddleware
+from .api import checklist, files, metrics, search
+from .metrics import MetricsMiddleware
 from .middleware import SharedChecklistMiddleware
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
 
-# Create uploads directory if it doesn't exist
-os.makedirs("uploads", exist_ok=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Migrations, directories and warm-up happen here rather than on import
+    await startup.start()
+    # Post-upload processing runs for as long as the app does
+    await jobs.queue.start()
+    yield
+    await jobs.queue.stop()
 
-app = FastAPI(title="Checklist Builder API")
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app() -> FastAPI:
+    """Build the application; nothing touches the database or disk until its lifespan starts"""
+    app = FastAPI(title="Checklist Builder API", lifespan=lifespan)
 
-# Add shared checklist middleware to protect edit operations
-app.add_middleware(SharedChecklistMiddleware)
+    # Each middleware added wraps the ones added before it
 
-# Include API routers
-app.include_router(checklist.router, tags=["checklists"])
-app.include_router(files.router, tags=["files"])
+    # Add shared checklist middleware to protect edit operations
+    app.add_middleware(SharedChecklistMiddleware)
 
-# Serve static files (uploads)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+    # Shed excess load before permission checks touch the database
+    if config.ADMISSION_ENABLED:
+        app.add_middleware(AdmissionMiddleware)
 
-@app.get("/")
-def root():
-    return {"message": "Checklist Builder API", "docs": "/docs"}
+    # Configure CORS. Outside the two above, so browsers can read their
+    # refusals (403, 429 and its Retry-After) too
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, replace with specific origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Retry-After"],
+    )
+
+    # Outermost, so timings and query counts include the middleware above
+    if config.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Include API routers
+    app.include_router(checklist.router, tags=["checklists"])
+    app.include_router(files.router, tags=["files"])
+    app.include_router(search.router, tags=["search"])
+    if config.METRICS_ENABLED:
+        app.include_router(metrics.router, tags=["metrics"])
+
+    @app.get("/")
+    def root():
+        return {"message": "Checklist Builder API", "docs": "/docs"}
+
+    return app
+
+
+app = create_app()
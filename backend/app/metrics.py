@@ -0,0 +1,335 @@
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import admission, cache, config, events, jobs, startup
+from .database import async_engine, engine
+
+logger = logging.getLogger(__name__)
+
+# Request latency buckets in seconds, and per-request query count buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+UPLOAD_SIZE_BUCKETS = (1024, 16 * 1024, 128 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Cumulative bucketed observations with their sum and count, optionally split by labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield self.name + "_bucket" + _labels(self.labelnames, labels, f'le="{le}"'), cumulative
+            yield self.name + "_sum" + _labels(self.labelnames, labels), total
+            yield self.name + "_count" + _labels(self.labelnames, labels), cumulative
+
+
+class Gauge:
+    """Value read when metrics are collected, e.g. the size of a queue
+
+    read returns a number, or a mapping of label value tuples to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.read = read
+
+    def samples(self):
+        try:
+            value = self.read()
+        except Exception:
+            logger.exception("Reading %s %s failed", self.kind, self.name)
+            return
+        if value is None:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, number in sorted(value.items()):
+            yield self.name + _labels(self.labelnames, labels), number
+
+
+class CallbackCounter(Gauge):
+    """Monotonic count kept elsewhere, e.g. by admission control, read when metrics are collected
+
+    read works as for Gauge.
+    """
+
+    kind = "counter"
+
+
+class Registry:
+    """The metrics an app exposes, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {_number(value)}" for sample, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last of its response",
+    LATENCY_BUCKETS, ("method", "route")
+))
+requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled", lambda: _in_progress
+))
+request_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", QUERY_COUNT_BUCKETS, ("method", "route")
+))
+request_db_time = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request", LATENCY_BUCKETS, ("method", "route")
+))
+queries_total = registry.register(Counter(
+    "db_queries_total", "SQL statements executed, including outside requests"
+))
+query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Time to execute one SQL statement", LATENCY_BUCKETS
+))
+upload_bytes = registry.register(Counter(
+    "upload_bytes_total", "Bytes of uploaded files written to storage"
+))
+upload_size = registry.register(Histogram(
+    "upload_size_bytes", "Size of each stored upload", UPLOAD_SIZE_BUCKETS
+))
+upload_duration = registry.register(Histogram(
+    "upload_store_seconds", "Time to hash and write each upload to storage", LATENCY_BUCKETS
+))
+
+cache_stats = registry.register(Gauge(
+    "public_checklist_cache", "Public checklist response cache size and counters",
+    lambda: {(key,): value for key, value in cache.public_checklists.stats().items()}, ("stat",)
+))
+job_queue_length = registry.register(Gauge(
+    "job_queue_queued", "Uploads waiting in the background processing queue", lambda: jobs.queue.queued
+))
+db_connections_in_use = registry.register(Gauge(
+    "db_connections_in_use", "Pooled database connections currently checked out",
+    lambda: _checked_out((async_engine.sync_engine if async_engine is not None else engine).pool)
+))
+event_subscribers = registry.register(Gauge(
+    "event_stream_subscribers", "Open live update (SSE) streams", lambda: events.hub.count
+))
+event_overflows = registry.register(CallbackCounter(
+    "event_stream_overflows_total", "Times a live update stream fell behind and was told to resync",
+    lambda: events.hub.overflows
+))
+admission_rejected = registry.register(CallbackCounter(
+    "admission_rejected_total", "Requests refused with a 429 by admission control, by limit",
+    lambda: {(reason,): count for reason, count in admission.controller.rejected.items()}, ("reason",)
+))
+admission_queued = registry.register(CallbackCounter(
+    "admission_uploads_queued_total", "Uploads that had to wait for room, admitted or not",
+    lambda: admission.controller.queued
+))
+uploads_in_flight = registry.register(Gauge(
+    "uploads_in_flight", "Uploads currently being received and stored",
+    lambda: admission.controller.uploads.in_flight
+))
+upload_bytes_in_flight = registry.register(Gauge(
+    "upload_bytes_in_flight", "Declared bytes of the uploads currently being received",
+    lambda: admission.controller.uploads.bytes
+))
+uploads_waiting = registry.register(Gauge(
+    "uploads_waiting", "Uploads waiting for room to be admitted",
+    lambda: admission.controller.uploads.waiting
+))
+startup_seconds = registry.register(Gauge(
+    "app_startup_seconds", "Time the last startup spent migrating and warming up before serving",
+    lambda: startup.seconds
+))
+
+_in_progress = 0
+
+
+def _checked_out(pool) -> Optional[int]:
+    # Only queue pools count connections; SQLite in memory uses a static one
+    checkedout = getattr(pool, "checkedout", None)
+    return checkedout() if checkedout is not None else None
+
+
+class RequestStats:
+    """What one request spent on the database; statements are kept only for the slow request log"""
+
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self, keep_statements: bool):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Optional[List[Tuple[float, str]]] = [] if keep_statements else None
+
+
+# Stats of the request being handled. Threadpool and run_sync calls run in a
+# copy of the request's context, so the same object is updated from there.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+# The start time is kept on the statement's execution context rather than the
+# connection, so a statement that fails (and never gets after_cursor_execute)
+# leaves nothing behind for the next one to pick up
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    queries_total.inc()
+    query_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append((elapsed, statement))
+
+
+def record_upload(size: int, seconds: float):
+    """Count an upload written to storage"""
+    upload_bytes.inc(size)
+    upload_size.observe(size)
+    upload_duration.observe(seconds)
+
+
+def _log_slow_request(method: str, path: str, status: int, seconds: float, stats: RequestStats):
+    slowest = sorted(stats.statements, key=lambda entry: entry[0], reverse=True)[:config.SLOW_REQUEST_MAX_STATEMENTS]
+    logger.warning(
+        "Slow request: %s %s -> %s in %.1f ms, %d queries taking %.1f ms%s",
+        method, path, status, seconds * 1000, stats.queries, stats.db_seconds * 1000,
+        "".join(f"\n  {elapsed * 1000:.1f} ms: {statement}" for elapsed, statement in slowest)
+    )
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status and database work of every HTTP request.
+
+    Requests are labelled with their route template (e.g. /checklists/{checklist_id})
+    rather than the raw path, so the number of series stays bounded. Requests
+    refused by admission control are labelled with the route they were aimed
+    at, and other ones that never reach a route (no match, or refused by
+    another middleware) with "unmatched". Latency runs until the last
+    response chunk is sent, so streamed downloads and exports count in full.
+    Requests slower than SLOW_REQUEST_MS are logged with their slowest SQL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _in_progress
+        slow_after = config.SLOW_REQUEST_MS / 1000
+        stats = RequestStats(keep_statements=slow_after > 0)
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _in_progress += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_progress -= 1
+            current_request.reset(token)
+            method = scope["method"]
+            route = getattr(scope.get("route"), "path", None) or scope.get("refused_route", "unmatched")
+            requests_total.inc(1, method, route, str(status))
+            request_duration.observe(elapsed, method, route)
+            request_queries.observe(stats.queries, method, route)
+            request_db_time.observe(stats.db_seconds, method, route)
+            if slow_after > 0 and elapsed >= slow_after:
+                _log_slow_request(method, scope["path"], status, elapsed, stats)
@@ -1,9 +1,32 @@
-from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 import re
+from urllib.parse import parse_qs
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from . import crud
+from .database import run_in_session
+
+# Precompiled route patterns, matched against the raw ASGI path
+PUBLIC_ROUTE = re.compile(r"^/checklists/public/")
+EDIT_LINK_ROUTE = re.compile(r"^/checklists/edit/")
+UPLOAD_ROUTE = re.compile(r"/uploads(/|$)")
+# Edit operations open to anyone: creating, importing and cloning checklists
+UNPROTECTED_EDITS = re.compile(r"^/checklists/(\d+/clone|import)?/?$")
+# Edit operations on a resource whose owning checklist the edit token must match
+RESOURCE_ROUTES = [
+    (re.compile(r"^/checklists/(\d+)(/categories)?/?$"), "checklist"),
+    (re.compile(r"^/categories/(\d+)(/items)?/?$"), "category"),
+    (re.compile(r"^/items/(\d+)/?$"), "item"),
+    (re.compile(r"^/uploads/(\d+)/?$"), "upload"),
+]
+
+PUBLIC_LINK_DENIED = "You don't have permission to edit this checklist. Use the edit link to modify the structure."
+EDIT_TOKEN_REQUIRED = "Edit operations require an edit_token parameter. Use the edit link to modify the structure."
+EDIT_TOKEN_INVALID = "The edit_token does not grant access to this checklist. Use the edit link to modify the structure."
 
-class SharedChecklistMiddleware(BaseHTTPMiddleware):
+
+class SharedChecklistMiddleware:
     """
     Middleware to protect edit operations for shared checklists.
     Third-party users accessing a checklist via public link can only upload files,
@@ -12,47 +35,49 @@ class SharedChecklistMiddleware(BaseHTTPMiddleware):
     Permission model:
     - Public link (/checklists/public/{public_link}): View-only with file upload permission
     - Edit link (/checklists/edit/{edit_token}): Full edit access
+    - Other edit operations need an edit_token query parameter belonging to the
+      checklist that owns the targeted checklist, category, item or upload
+    
+    Implemented as plain ASGI rather than BaseHTTPMiddleware, so allowed requests
+    pass straight through without extra tasks or buffered response streams.
     """
     
-    async def dispatch(self, request: Request, call_next):
-        # Get the path and method
-        path = request.url.path
-        method = request.method
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            detail = await self.denial(scope["path"], scope["method"], scope["query_string"])
+            if detail is not None:
+                response = JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": detail})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+    
+    async def denial(self, path: str, method: str, query_string: bytes):
+        """Return why a request is forbidden, or None to let it through"""
+        # Public link access: viewing and file uploads only
+        if PUBLIC_ROUTE.match(path):
+            if method == "GET" or (method == "POST" and UPLOAD_ROUTE.search(path)):
+                return None
+            return PUBLIC_LINK_DENIED
         
-        # Check if this is a public link access
-        if "checklists/public/" in path:
-            # Allow GET requests (viewing) for all paths
-            if method == "GET":
-                return await call_next(request)
-                
-            # Allow POST requests only for file uploads
-            if method == "POST" and "uploads" in path:
-                return await call_next(request)
-            
-            # Block all other methods (PUT, DELETE, POST to non-upload endpoints)
-            return JSONResponse(
-                status_code=status.HTTP_403_FORBIDDEN,
-                content={"detail": "You don't have permission to edit this checklist. Use the edit link to modify the structure."}
-            )
+        # Only PUT, DELETE and non-upload POSTs edit anything
+        if method not in ("PUT", "DELETE", "POST") or (method == "POST" and UPLOAD_ROUTE.search(path)):
+            return None
+        if (method == "POST" and UNPROTECTED_EDITS.match(path)) or EDIT_LINK_ROUTE.match(path):
+            return None
         
-        # For direct API access (not via public or edit links), require edit token in the path or query
-        # This applies to PUT, DELETE, and POST operations on checklists, categories, and items
-        if method in ["PUT", "DELETE"] or (method == "POST" and "uploads" not in path):
-            # Skip this check for the initial checklist creation endpoint and cloning
-            if path == "/checklists/" and method == "POST" or "clone" in path:
-                return await call_next(request)
-                
-            # Skip this check if accessing via edit token
-            if "checklists/edit/" in path:
-                return await call_next(request)
-                
-            # For all other edit operations, require the edit_token parameter
-            query_params = request.query_params
-            if "edit_token" not in query_params:
-                return JSONResponse(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    content={"detail": "Edit operations require an edit_token parameter. Use the edit link to modify the structure."}
-                )
+        edit_token = parse_qs(query_string.decode("latin-1")).get("edit_token")
+        if not edit_token:
+            return EDIT_TOKEN_REQUIRED
         
-        # For all other requests, proceed normally
-        return await call_next(request)
+        for pattern, kind in RESOURCE_ROUTES:
+            match = pattern.match(path)
+            if match:
+                allowed = await run_in_session(
+                    crud.get_edit_access, edit_token[0], kind, int(match.group(1))
+                )
+                # A missing resource falls through to the endpoint's 404
+                return EDIT_TOKEN_INVALID if allowed is False else None
+        return None
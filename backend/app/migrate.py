@@ -0,0 +1,84 @@
+import os
+from contextlib import contextmanager
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, start one process at a time
+    fcntl = None
+
+# Alembic migrations are the source of truth for the schema: create_all cannot
+# add columns, indexes or constraints to a database that already exists
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+@contextmanager
+def migration_connection(engine):
+    """Connection to run migrations on
+
+    SQLite foreign key enforcement is switched off meanwhile: batch migrations
+    rebuild tables by copying and dropping them, and dropping a parent table
+    with enforcement on would cascade into its children.
+    """
+    with engine.connect() as connection:
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys = OFF")
+            connection.commit()
+        try:
+            yield connection
+        finally:
+            if sqlite and config.SQLITE_FOREIGN_KEYS:
+                connection.exec_driver_sql("PRAGMA foreign_keys = ON")
+                connection.commit()
+
+
+def upgrade_database(engine, revision: str = "head"):
+    """Migrate the database behind engine to revision"""
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", MIGRATIONS_DIR)
+    with migration_connection(engine) as connection:
+        alembic_config.attributes["connection"] = connection
+        command.upgrade(alembic_config, revision)
+
+
+def is_current(engine) -> bool:
+    """Whether the database behind engine is already at the newest revision"""
+    heads = ScriptDirectory(MIGRATIONS_DIR).get_heads()
+    with engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads()) == set(heads)
+
+
+@contextmanager
+def exclusive_lock(path: str):
+    """Hold an exclusive advisory lock on a file, waiting for other processes to release it"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def prepare_database(engine) -> bool:
+    """Migrate the database to head unless it already is; returns whether it migrated
+
+    Safe to call from several processes starting together: the first to take
+    STARTUP_LOCK_FILE migrates, the rest wait for it and find nothing to do.
+    """
+    if is_current(engine):
+        return False
+    with exclusive_lock(config.STARTUP_LOCK_FILE):
+        if is_current(engine):
+            return False
+        upgrade_database(engine)
+        return True
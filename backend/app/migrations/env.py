@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import migrate, models
+from app.database import engine
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the full-text search tables, which have no models, out of autogenerate"""
+    return not (type_ == "table" and "_fts" in name)
+
+
+def run_migrations(connection):
+    # Batch mode lets autogenerated migrations alter tables on SQLite, which
+    # can only do so by rebuilding them
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline():
+    """Emit the migration SQL instead of running it"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif "connection" in config.attributes:
+    # Called from migrate.upgrade_database, which prepared the connection
+    run_migrations(config.attributes["connection"])
+else:
+    with migrate.migration_connection(engine) as connection:
+        run_migrations(connection)
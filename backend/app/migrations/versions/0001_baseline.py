@@ -0,0 +1,106 @@
+"""Baseline schema
+
+Databases used to be created with metadata.create_all, which never altered
+existing tables. This revision therefore creates whatever part of the schema
+is missing instead of assuming an empty database, so databases from any
+earlier release are adopted as they are.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    def columns(table):
+        return {column["name"] for column in inspector.get_columns(table)}
+
+    def indexes(table):
+        return {index["name"] for index in inspector.get_indexes(table)}
+
+    if "checklists" not in tables:
+        op.create_table(
+            "checklists",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("public_link", sa.String(), nullable=True),
+            sa.Column("edit_token", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        )
+        op.create_index("ix_checklists_id", "checklists", ["id"])
+        op.create_index("ix_checklists_public_link", "checklists", ["public_link"], unique=True)
+        op.create_index("ix_checklists_edit_token", "checklists", ["edit_token"], unique=True)
+    elif "version" not in columns("checklists"):
+        op.add_column("checklists", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    if "ix_checklists_created_at_id" not in indexes("checklists"):
+        op.create_index("ix_checklists_created_at_id", "checklists", ["created_at", "id"])
+
+    if "categories" not in tables:
+        op.create_table(
+            "categories",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("checklist_id", sa.Integer(), sa.ForeignKey("checklists.id"), nullable=True),
+        )
+        op.create_index("ix_categories_id", "categories", ["id"])
+
+    if "items" not in tables:
+        op.create_table(
+            "items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("allow_multiple_files", sa.Boolean(), nullable=True),
+            sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id"), nullable=True),
+        )
+        op.create_index("ix_items_id", "items", ["id"])
+
+    if "blobs" not in tables:
+        op.create_table(
+            "blobs",
+            sa.Column("sha256", sa.String(64), primary_key=True),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("ref_count", sa.Integer(), nullable=False),
+        )
+
+    if "file_uploads" not in tables:
+        op.create_table(
+            "file_uploads",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("filename", sa.String(), nullable=False),
+            sa.Column("uploaded_at", sa.DateTime(), nullable=True),
+            sa.Column("item_id", sa.Integer(), sa.ForeignKey("items.id"), nullable=True),
+            sa.Column("uploader", sa.String(), nullable=True),
+            sa.Column("sha256", sa.String(64), sa.ForeignKey("blobs.sha256"), nullable=True),
+            sa.Column("size", sa.Integer(), nullable=True),
+        )
+        op.create_index("ix_file_uploads_id", "file_uploads", ["id"])
+    else:
+        existing = columns("file_uploads")
+        # Batch mode, as SQLite can only add the foreign key by rebuilding the table
+        with op.batch_alter_table("file_uploads") as batch:
+            if "sha256" not in existing:
+                batch.add_column(sa.Column("sha256", sa.String(64), sa.ForeignKey("blobs.sha256", name="fk_file_uploads_sha256"), nullable=True))
+            if "size" not in existing:
+                batch.add_column(sa.Column("size", sa.Integer(), nullable=True))
+    if "ix_file_uploads_sha256" not in indexes("file_uploads"):
+        op.create_index("ix_file_uploads_sha256", "file_uploads", ["sha256"])
+
+
+def downgrade():
+    op.drop_table("file_uploads")
+    op.drop_table("blobs")
+    op.drop_table("items")
+    op.drop_table("categories")
+    op.drop_table("checklists")
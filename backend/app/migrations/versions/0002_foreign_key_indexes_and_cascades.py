@@ -0,0 +1,53 @@
+"""Index foreign keys and cascade deletes in the database
+
+Relationship loads and per-item upload lookups filter on these foreign keys,
+which were unindexed. ON DELETE CASCADE lets a single DELETE remove a whole
+subtree without loading it. SQLite cannot alter constraints, so there the
+tables are rebuilt in batch mode.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (table, foreign key column, referenced table)
+FOREIGN_KEYS = [
+    ("categories", "checklist_id", "checklists"),
+    ("items", "category_id", "categories"),
+    ("file_uploads", "item_id", "items"),
+]
+
+
+def _replace_foreign_key(table, column, parent, ondelete):
+    """Recreate table's foreign key on column with the given ON DELETE action"""
+    if op.get_bind().dialect.name == "sqlite":
+        # Foreign keys are unnamed on SQLite; the naming convention names the
+        # reflected one so the rebuilt table can swap it out
+        with op.batch_alter_table(
+            table,
+            recreate="always",
+            naming_convention={"fk": "fk_%(table_name)s_%(column_0_name)s"}
+        ) as batch:
+            batch.drop_constraint(f"fk_{table}_{column}", type_="foreignkey")
+            batch.create_foreign_key(f"fk_{table}_{column}", parent, [column], ["id"], ondelete=ondelete)
+    else:
+        op.drop_constraint(f"{table}_{column}_fkey", table, type_="foreignkey")
+        op.create_foreign_key(f"{table}_{column}_fkey", table, parent, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade():
+    for table, column, parent in FOREIGN_KEYS:
+        _replace_foreign_key(table, column, parent, "CASCADE")
+        op.create_index(f"ix_{table}_{column}", table, [column])
+
+
+def downgrade():
+    for table, column, parent in reversed(FOREIGN_KEYS):
+        op.drop_index(f"ix_{table}_{column}", table)
+        _replace_foreign_key(table, column, parent, None)
@@ -0,0 +1,36 @@
+"""Track background processing of uploads
+
+Existing uploads start out pending, so the job queue processes them once
+after upgrading.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("file_uploads") as batch:
+        batch.add_column(sa.Column("processing_status", sa.String(16), nullable=False, server_default="pending"))
+        batch.add_column(sa.Column("processing_error", sa.Text(), nullable=True))
+        batch.add_column(sa.Column("processed_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("has_thumbnail", sa.Boolean(), nullable=False, server_default="0"))
+        batch.add_column(sa.Column("extracted_text", sa.Text(), nullable=True))
+        batch.create_index("ix_file_uploads_processing_status", ["processing_status"])
+
+
+def downgrade():
+    with op.batch_alter_table("file_uploads") as batch:
+        batch.drop_index("ix_file_uploads_processing_status")
+        batch.drop_column("extracted_text")
+        batch.drop_column("has_thumbnail")
+        batch.drop_column("processed_at")
+        batch.drop_column("processing_error")
+        batch.drop_column("processing_status")
@@ -0,0 +1,64 @@
+"""Full-text search index
+
+One FTS5 table per searchable table, using it as external content so the
+text is not stored twice. Triggers keep the indexes in sync with every write,
+including set-based statements and ON DELETE CASCADE, so crud needs no search
+bookkeeping. FTS5 is SQLite-only; other databases are left without an index.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Indexed table -> its text columns
+SEARCHABLE = {
+    "checklists": ["title", "description"],
+    "categories": ["name"],
+    "items": ["name"],
+    "file_uploads": ["filename", "extracted_text"],
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table, columns in SEARCHABLE.items():
+        index = f"{table}_fts"
+        listed = ", ".join(columns)
+        new = ", ".join(f"new.{column}" for column in columns)
+        old = ", ".join(f"old.{column}" for column in columns)
+        op.execute(
+            f"CREATE VIRTUAL TABLE {index} USING fts5({listed}, "
+            f"content='{table}', content_rowid='id', prefix='3', tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {index}(rowid, {listed}) VALUES (new.id, {new}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {listed}) VALUES ('delete', old.id, {old}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {index}_update AFTER UPDATE OF {listed} ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {listed}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {index}(rowid, {listed}) VALUES (new.id, {new}); END"
+        )
+        # Index the rows that already exist
+        op.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table in SEARCHABLE:
+        index = f"{table}_fts"
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {index}_{trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {index}")
@@ -0,0 +1,65 @@
+"""Completion counters on checklists and categories
+
+Item, completed item (at least one upload), upload and byte counts are
+stored on each category and summed onto its checklist, so list and detail
+views show progress without counting the tree. Existing rows are counted
+once here; crud keeps the counters current and `python -m app.reconcile`
+rebuilds them.
+
+Plain ADD/DROP COLUMN rather than batch mode, so the tables are not rebuilt
+and their full-text search triggers stay in place.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+CATEGORY_COUNTERS = ["item_count", "completed_item_count", "upload_count", "upload_bytes"]
+CHECKLIST_COUNTERS = ["category_count"] + CATEGORY_COUNTERS
+
+
+def upgrade():
+    for column in CATEGORY_COUNTERS:
+        op.add_column("categories", sa.Column(column, sa.Integer(), nullable=False, server_default="0"))
+    for column in CHECKLIST_COUNTERS:
+        op.add_column("checklists", sa.Column(column, sa.Integer(), nullable=False, server_default="0"))
+
+    op.execute("""
+        UPDATE categories SET
+            item_count = (SELECT count(*) FROM items WHERE items.category_id = categories.id),
+            completed_item_count = (
+                SELECT count(*) FROM items WHERE items.category_id = categories.id
+                AND EXISTS (SELECT 1 FROM file_uploads WHERE file_uploads.item_id = items.id)
+            ),
+            upload_count = (
+                SELECT count(*) FROM file_uploads JOIN items ON file_uploads.item_id = items.id
+                WHERE items.category_id = categories.id
+            ),
+            upload_bytes = (
+                SELECT coalesce(sum(file_uploads.size), 0) FROM file_uploads JOIN items ON file_uploads.item_id = items.id
+                WHERE items.category_id = categories.id
+            )
+    """)
+    op.execute(
+        "UPDATE checklists SET category_count = "
+        "(SELECT count(*) FROM categories WHERE categories.checklist_id = checklists.id), "
+        + ", ".join(
+            f"{column} = (SELECT coalesce(sum(categories.{column}), 0) FROM categories "
+            f"WHERE categories.checklist_id = checklists.id)"
+            for column in CATEGORY_COUNTERS
+        )
+    )
+
+
+def downgrade():
+    for column in reversed(CHECKLIST_COUNTERS):
+        op.drop_column("checklists", column)
+    for column in reversed(CATEGORY_COUNTERS):
+        op.drop_column("categories", column)
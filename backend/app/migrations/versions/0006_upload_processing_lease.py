@@ -0,0 +1,29 @@
+"""Lease on upload processing
+
+A job queue claims an upload by setting processing_started_at along with
+the processing status. Uploads left processing longer than JOB_LEASE_SECONDS,
+e.g. by a worker that died, can be claimed again. Uploads already processing
+have no start time, so their lease counts as expired.
+
+Plain ADD/DROP COLUMN rather than batch mode, so the table is not rebuilt
+and its full-text search triggers stay in place.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("file_uploads", sa.Column("processing_started_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("file_uploads", "processing_started_at")
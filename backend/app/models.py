@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Text, Index
+from sqlalchemy.orm import deferred, relationship
 from .database import Base
 import datetime
 
@@ -11,35 +11,66 @@ class Checklist(Base):
     public_link = Column(String, unique=True, index=True)
     edit_token = Column(String, unique=True, index=True)  # Token for edit access
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)  # Bumped by every change to the checklist tree
+    # Completion counters over the whole tree, kept up to date by crud
+    category_count = Column(Integer, nullable=False, default=0, server_default="0")
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_item_count = Column(Integer, nullable=False, default=0, server_default="0")  # Items with an upload
+    upload_count = Column(Integer, nullable=False, default=0, server_default="0")
+    upload_bytes = Column(Integer, nullable=False, default=0, server_default="0")
 
-    categories = relationship("Category", back_populates="checklist", cascade="all, delete-orphan")
+    categories = relationship("Category", back_populates="checklist", cascade="all, delete-orphan", passive_deletes=True)
+
+    # Backs keyset pagination of the checklist listing, newest first
+    __table_args__ = (Index("ix_checklists_created_at_id", "created_at", "id"),)
 
 class Category(Base):
     __tablename__ = "categories"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    checklist_id = Column(Integer, ForeignKey("checklists.id"))
+    checklist_id = Column(Integer, ForeignKey("checklists.id", ondelete="CASCADE"), index=True)
+    # Completion counters over the category's items, kept up to date by crud
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_item_count = Column(Integer, nullable=False, default=0, server_default="0")  # Items with an upload
+    upload_count = Column(Integer, nullable=False, default=0, server_default="0")
+    upload_bytes = Column(Integer, nullable=False, default=0, server_default="0")
 
     checklist = relationship("Checklist", back_populates="categories")
-    items = relationship("Item", back_populates="category", cascade="all, delete-orphan")
+    items = relationship("Item", back_populates="category", cascade="all, delete-orphan", passive_deletes=True)
 
 class Item(Base):
     __tablename__ = "items"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     allow_multiple_files = Column(Boolean, default=False)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), index=True)
 
     category = relationship("Category", back_populates="items")
-    uploads = relationship("FileUpload", back_populates="item", cascade="all, delete-orphan")
+    uploads = relationship("FileUpload", back_populates="item", cascade="all, delete-orphan", passive_deletes=True)
 
 class FileUpload(Base):
     __tablename__ = "file_uploads"
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     uploaded_at = Column(DateTime, default=datetime.datetime.utcnow)
-    item_id = Column(Integer, ForeignKey("items.id"))
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), index=True)
     uploader = Column(String, nullable=True)  # Optionally store who uploaded
+    sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True, index=True)  # Null for legacy uploads
+    size = Column(Integer, nullable=True)
+    # Background processing (see jobs.py): pending, processing, done or failed
+    processing_status = Column(String(16), nullable=False, default="pending", server_default="pending", index=True)
+    processing_error = Column(Text, nullable=True)
+    processing_started_at = Column(DateTime, nullable=True)  # When a job queue claimed it
+    processed_at = Column(DateTime, nullable=True)
+    has_thumbnail = Column(Boolean, nullable=False, default=False, server_default="0")
+    extracted_text = deferred(Column(Text, nullable=True))  # Only loaded when asked for
 
     item = relationship("Item", back_populates="uploads")
 
+
+# Stored file content, shared by every FileUpload with the same sha256
+class Blob(Base):
+    __tablename__ = "blobs"
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
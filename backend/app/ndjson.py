@@ -0,0 +1,65 @@
+from typing import AsyncIterator, Iterable, Iterator, Optional, Tuple
+
+from . import serializers
+
+# Newline-delimited JSON: one document per line, for bulk import and export
+# of checklists (see POST /checklists/import and GET /checklists/export.ndjson)
+
+CHUNK_SIZE = 64 * 1024  # Bytes of encoded lines sent at once
+
+
+async def read_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Split a byte stream into lines as it arrives, yielding (line number, line)
+
+    Lines are numbered from 1; blank ones are counted but not yielded. A line
+    longer than max_line_bytes is yielded as None without being buffered, so
+    memory stays bounded whatever the input.
+    """
+    buffer = bytearray()
+    line_number = 0
+    too_long = False
+
+    def finish():
+        if too_long:
+            return None
+        return bytes(buffer) if buffer.strip() else b""
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if not too_long:
+                buffer += chunk[start:] if end == -1 else chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    too_long = True
+                    buffer.clear()
+            if end == -1:
+                break
+            line_number += 1
+            line = finish()
+            if line != b"":
+                yield line_number, line
+            buffer.clear()
+            too_long = False
+            start = end + 1
+
+    line = finish()
+    if line != b"":
+        yield line_number + 1, line
+
+
+def encode(documents: Iterable) -> Iterator[bytes]:
+    """Encode documents as NDJSON, in chunks of about CHUNK_SIZE bytes
+
+    Consumes documents lazily, so it streams as fast as they are produced.
+    """
+    pending, size = [], 0
+    for document in documents:
+        line = serializers.dumps(document) + b"\n"
+        pending.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
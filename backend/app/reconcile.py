@@ -0,0 +1,33 @@
+"""Rebuild the stored completion counters of checklists and categories.
+
+Counters are kept current by crud, so this is only needed after writing to
+the database some other way, or to check for drift. Run from the backend
+directory:
+
+    python -m app.reconcile                 # every checklist
+    python -m app.reconcile --checklist 12  # just these (repeatable)
+"""
+import argparse
+
+from . import crud
+from .database import SessionLocal, engine
+from .migrate import prepare_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checklist", type=int, action="append", dest="checklist_ids",
+                        help="Id of a checklist to rebuild; defaults to all")
+    args = parser.parse_args()
+
+    prepare_database(engine)
+    with SessionLocal() as db:
+        stale = crud.reconcile_counters(db, args.checklist_ids)
+    if stale:
+        print(f"Rebuilt counters; {len(stale)} checklist(s) were out of date: {', '.join(map(str, stale))}")
+    else:
+        print("Rebuilt counters; all were up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,38 @@ class FileUploadBase(BaseModel):
 class FileUploadCreate(BaseModel):
     filename: str
     uploader: Optional[str] = None
+    sha256: Optional[str] = None
+    size: Optional[int] = None
 
 class FileUpload(FileUploadBase):
     id: int
+    sha256: Optional[str] = None
+    size: Optional[int] = None
+    processing_status: Optional[str] = None
+    has_thumbnail: bool = False
     class Config:
         orm_mode = True
 
+class UploadProcessing(BaseModel):
+    file_id: int
+    status: str  # pending, processing, done or failed
+    error: Optional[str] = None
+    processed_at: Optional[datetime.datetime] = None
+    has_thumbnail: bool = False
+    text_length: Optional[int] = None  # Characters of extracted text, if any
+
+class JobQueueStatus(BaseModel):
+    running: bool
+    workers: int
+    queued: int
+    pending_uploads: int  # Uploads waiting for or undergoing processing
+
+class FileUploadResult(BaseModel):
+    filename: str
+    item_id: int
+    upload: Optional[FileUpload] = None  # Set when the file was stored
+    error: Optional[str] = None  # Why the file was rejected
+
 class ItemBase(BaseModel):
     name: str
     allow_multiple_files: bool = False
@@ -26,6 +52,9 @@ class ItemCreate(ItemBase):
 class ItemUpdate(ItemBase):
     pass
 
+class ItemTreeUpdate(ItemBase):
+    id: Optional[int] = None  # Existing item to update in place; omit to add one
+
 class Item(ItemBase):
     id: int
     uploads: List[FileUpload] = []
@@ -39,9 +68,19 @@ class CategoryCreate(CategoryBase):
     items: List[ItemCreate] = []
 
 class CategoryUpdate(CategoryBase):
-    items: Optional[List[ItemCreate]] = None
+    items: Optional[List[ItemTreeUpdate]] = None
+
+class CategoryTreeUpdate(CategoryBase):
+    id: Optional[int] = None  # Existing category to update in place; omit to add one
+    items: List[ItemTreeUpdate] = []
+
+class CompletionCounts(BaseModel):
+    item_count: int = 0
+    completed_item_count: int = 0  # Items with at least one upload
+    upload_count: int = 0
+    upload_bytes: int = 0
 
-class Category(CategoryBase):
+class Category(CategoryBase, CompletionCounts):
     id: int
     items: List[Item] = []
     class Config:
@@ -55,14 +94,54 @@ class ChecklistCreate(ChecklistBase):
     categories: List[CategoryCreate] = []
 
 class ChecklistUpdate(ChecklistBase):
-    categories: Optional[List[CategoryCreate]] = None
+    categories: Optional[List[CategoryTreeUpdate]] = None
 
-class Checklist(ChecklistBase):
+class Checklist(ChecklistBase, CompletionCounts):
     id: int
     public_link: str
     edit_token: str
     created_at: datetime.datetime
+    category_count: int = 0
     categories: List[Category] = []
     class Config:
         orm_mode = True
 
+
+class ChecklistSummary(ChecklistBase, CompletionCounts):
+    id: int
+    public_link: str
+    edit_token: str
+    created_at: datetime.datetime
+    category_count: int = 0
+    class Config:
+        orm_mode = True
+
+class ChecklistSummaryPage(BaseModel):
+    items: List[ChecklistSummary] = []
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to fetch the next page
+
+class ImportedChecklist(BaseModel):
+    line: int  # Of the import body, counting from 1
+    id: int
+    public_link: str
+    edit_token: str
+
+class ImportLineError(BaseModel):
+    line: int
+    error: str
+
+class ChecklistImportResult(BaseModel):
+    created: List[ImportedChecklist] = []
+    errors: List[ImportLineError] = []
+
+class SearchHit(BaseModel):
+    kind: str  # checklist, category, item or upload
+    id: int  # Of the matching checklist, category, item or file upload
+    checklist_id: int
+    checklist_title: str
+    snippet: str  # Matching text, with matches wrapped in <mark></mark>
+    rank: float  # Lower is better
+
+class SearchPage(BaseModel):
+    items: List[SearchHit] = []
+    next_offset: Optional[int] = None  # Pass back as `offset` to fetch the next page
@@ -0,0 +1,25 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+# Read endpoints return checklist trees built as plain dicts by
+# crud.get_checklist_tree*, encoded with orjson. This skips response_model
+# validation and jsonable_encoder, which dominate CPU time for large checklists.
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as JSON bytes; datetimes become ISO 8601 strings"""
+    return orjson.dumps(content)
+
+
+def loads(data: bytes) -> Any:
+    """Decode JSON bytes; raises ValueError if they are not valid JSON"""
+    return orjson.loads(data)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,46 @@
+import logging
+import os
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from . import cache, config, crud, serializers, storage
+from .database import engine, run_in_session, warm_pool
+
+logger = logging.getLogger(__name__)
+
+# Work done once per process before it serves requests, from the app's
+# lifespan rather than at import time: importing the app has no side
+# effects, and several workers starting together migrate the schema only once.
+
+# Seconds the last startup took, exposed as a metric
+seconds = None
+
+
+def prepare():
+    """Make sure the schema is current and the upload directory exists; blocking"""
+    if not config.DATABASE_PREPARED:
+        # Imported here: alembic is slow to import and not needed otherwise
+        from .migrate import prepare_database
+
+        prepare_database(engine)
+    os.makedirs(storage.UPLOAD_DIR, exist_ok=True)
+
+
+async def warm_cache(limit: int):
+    """Fill the public checklist cache with the newest checklists' response bodies"""
+    if limit <= 0:
+        return
+    for key, tree in await run_in_session(crud.get_newest_checklist_trees, limit):
+        cache.public_checklists.put(key, serializers.dumps(tree))
+
+
+async def start():
+    """Prepare the database, then open pooled connections and warm the caches"""
+    global seconds
+    started = time.perf_counter()
+    await run_in_threadpool(prepare)
+    await warm_pool(config.STARTUP_WARM_CONNECTIONS)
+    await warm_cache(config.STARTUP_WARM_CHECKLISTS)
+    seconds = time.perf_counter() - started
+    logger.info("Started in %.1f ms", seconds * 1000)
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Iterable, Optional, Tuple
+
+# Uploaded content is stored once per distinct sha256 under a sharded
+# UPLOAD_DIR/ab/cd/<sha256> layout, so identical files are deduplicated and no
+# single directory grows unbounded. Blob rows in the database reference-count
+# the files; see crud.create_file_upload, crud.delete_file_upload and
+# crud.purge_blobs.
+UPLOAD_DIR = "uploads"
+CHUNK_SIZE = 64 * 1024  # Bytes held in memory at once while copying an upload
+
+
+class FileTooLarge(Exception):
+    """Raised when an upload exceeds the allowed size"""
+
+
+def blob_path(digest: str) -> str:
+    """Path of the blob with the given sha256 hex digest"""
+    return os.path.join(UPLOAD_DIR, digest[:2], digest[2:4], digest)
+
+
+def thumbnail_path(digest: str) -> str:
+    """Path of the PNG thumbnail rendered for the blob with the given digest"""
+    return os.path.join(UPLOAD_DIR, "thumbnails", digest[:2], f"{digest}.png")
+
+
+def legacy_path(item_id: int, filename: str) -> str:
+    """Path of an upload stored before content addressing"""
+    return os.path.join(UPLOAD_DIR, f"{item_id}_{filename}")
+
+
+def upload_path(sha256: Optional[str], item_id: int, filename: str) -> str:
+    """Path of an upload's content, whether content-addressed or legacy"""
+    if sha256 is not None:
+        return blob_path(sha256)
+    return legacy_path(item_id, filename)
+
+
+def store_stream(source: BinaryIO, max_size: int) -> Tuple[str, str, int]:
+    """Copy a file object into a temporary file in blob storage chunk by chunk, hashing as it goes
+
+    The file becomes the blob through publish_blob once a reference to it is
+    held, or is removed with discard, so a rejected or interrupted upload never
+    leaves a partial blob behind. Returns (temporary path, sha256 hex digest,
+    size in bytes). Blocking; call it from a worker thread.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-")
+    try:
+        sha256 = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge(f"Upload exceeds {max_size} bytes")
+                sha256.update(chunk)
+                buffer.write(chunk)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by the owner only
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, sha256.hexdigest(), size
+
+
+def publish_blob(tmp_path: str, digest: str) -> bool:
+    """Atomically rename a file written by store_stream to its blob path
+
+    Content that is already stored is not written twice. Returns whether the
+    file was put in place. Call it while holding a reference to the blob; see
+    crud.create_file_upload.
+    """
+    path = blob_path(digest)
+    if os.path.exists(path):
+        os.unlink(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return True
+
+
+def discard(tmp_path: str):
+    """Remove a file written by store_stream unless it was published"""
+    delete_files([tmp_path])
+
+
+def delete_files(paths: Iterable[str]):
+    """Remove stored files from disk, ignoring ones that are already gone"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,268 @@
+"""API benchmark suite: latency, throughput and query counts per endpoint.
+
+Seeds synthetic checklists of a configurable shape through the API, then
+drives listing, public-link reads, bulk updates, uploads and clones, both
+in-process (httpx ASGI transport) and over HTTP against uvicorn. Each target
+gets a fresh database in a temporary directory. Query counts come from the
+app's /metrics, so METRICS_ENABLED must be on (the default). Run from the
+backend directory; the JSON report goes to stdout or --output, ready to diff
+between commits:
+
+    python -m benchmarks.bench_api --checklists 20 --categories 10 --items 10 --uploads 1
+    python -m benchmarks.bench_api --target inprocess --scenarios public,update --output before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_load import BACKEND_DIR, free_port, wait_until_up
+
+SCENARIOS = ("list", "public", "update", "upload", "clone")
+TARGETS = ("inprocess", "uvicorn")
+UPLOAD_BYTES = 64 * 1024
+QUERY_SUM = re.compile(r'^http_request_db_queries_sum\{.*\} (\S+)$', re.MULTILINE)
+
+
+class Seeded:
+    """Ids and tokens of the seeded checklists, and the trees used for updates"""
+
+    def __init__(self, checklists):
+        self.checklists = checklists
+        self.items = [item["id"] for checklist in checklists
+                      for category in checklist["categories"] for item in category["items"]]
+
+
+async def seed(client: httpx.AsyncClient, checklists: int, categories: int, items: int, uploads: int) -> Seeded:
+    """Create checklists of the requested shape, with `uploads` files on every item"""
+    created = []
+    for n in range(checklists):
+        response = await client.post("/checklists/", json={
+            "title": f"Benchmark checklist {n}",
+            "description": "Synthetic checklist",
+            "categories": [
+                {"name": f"Category {c}", "items": [
+                    {"name": f"Item {c}.{i}", "allow_multiple_files": True} for i in range(items)
+                ]}
+                for c in range(categories)
+            ]
+        })
+        response.raise_for_status()
+        checklist = response.json()
+        item_ids = [item["id"] for category in checklist["categories"] for item in category["items"]]
+        for _ in range(uploads):
+            if not item_ids:
+                break
+            response = await client.post(
+                f"/checklists/{checklist['id']}/uploads/batch",
+                data={"item_ids": [str(item_id) for item_id in item_ids]},
+                files=[("files", (f"seed-{item_id}.txt", f"seed {item_id}".encode())) for item_id in item_ids]
+            )
+            response.raise_for_status()
+        created.append(checklist)
+    return Seeded(created)
+
+
+def scenario_request(name: str, seeded: Seeded, n: int):
+    """(method, url, keyword arguments) of the n-th request of a scenario"""
+    checklist = seeded.checklists[n % len(seeded.checklists)]
+    if name == "list":
+        return "GET", "/checklists/summary", {"params": {"limit": 50}}
+    if name == "public":
+        return "GET", f"/checklists/public/{checklist['public_link']}", {}
+    if name == "update":
+        # Rename everything, keeping ids so the tree is updated in place
+        return "PUT", f"/checklists/{checklist['id']}", {
+            "params": {"edit_token": checklist["edit_token"]},
+            "json": {
+                "title": f"{checklist['title']} ({n})",
+                "description": checklist["description"],
+                "categories": [
+                    {"id": category["id"], "name": f"{category['name']} ({n})", "items": [
+                        {"id": item["id"], "name": f"{item['name']} ({n})",
+                         "allow_multiple_files": item["allow_multiple_files"]}
+                        for item in category["items"]
+                    ]}
+                    for category in checklist["categories"]
+                ]
+            }
+        }
+    if name == "upload":
+        item_id = seeded.items[n % len(seeded.items)]
+        return "POST", f"/items/{item_id}/uploads/", {
+            "files": {"file": (f"bench-{n}.txt", os.urandom(UPLOAD_BYTES))}
+        }
+    if name == "clone":
+        return "POST", f"/checklists/{checklist['id']}/clone", {}
+    raise ValueError(f"Unknown scenario {name}")
+
+
+async def request_queries(client: httpx.AsyncClient) -> float:
+    """SQL statements executed by requests so far, according to the app's metrics"""
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    return sum(float(value) for value in QUERY_SUM.findall(response.text))
+
+
+def percentile(ordered, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, seeded: Seeded,
+                       requests: int, concurrency: int, warmup: int):
+    for n in range(warmup):
+        method, url, kwargs = scenario_request(name, seeded, n)
+        await client.request(method, url, **kwargs)
+
+    latencies, errors = [], 0
+    pending = iter(range(warmup, warmup + requests))
+
+    async def worker():
+        nonlocal errors
+        for n in pending:
+            method, url, kwargs = scenario_request(name, seeded, n)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    queries_before = await request_queries(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    queries_after = await request_queries(client)
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "req_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        # Scraping /metrics runs no SQL, so the difference is the scenario's alone
+        "queries_per_request": round((queries_after - queries_before) / requests, 2),
+    }
+
+
+async def drive(client: httpx.AsyncClient, args):
+    seeded = await seed(client, args.checklists, args.categories, args.items, args.uploads)
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(client, name, seeded, args.requests, args.concurrency, args.warmup)
+    return results
+
+
+def run_inprocess(args, workdir: str):
+    """Drive the app through httpx's ASGI transport, without sockets or a server"""
+    # The app reads its settings on import and uses relative paths for its files
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'checklist.db')}"
+    os.chdir(workdir)
+    from app.main import app
+
+    async def run():
+        # The transport does not send lifespan events, so run startup here
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                return await drive(client, args)
+
+    return asyncio.run(run())
+
+
+def run_uvicorn(args, workdir: str):
+    """Drive a uvicorn server over loopback HTTP, lifespan and job queue included"""
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'checklist.db')}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--log-level", "warning", "--timeout-keep-alive", "60"],
+        cwd=workdir, env=env
+    )
+
+    async def run():
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_until_up(client)
+            return await drive(client, args)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checklists", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--items", type=int, default=10, help="Items per category")
+    parser.add_argument("--uploads", type=int, default=1, help="Seeded uploads per item")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--target", choices=TARGETS + ("both",), default="both")
+    parser.add_argument("--async-db", action="store_true", help="Run the app with CHECKLIST_ASYNC_DB=1")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    os.environ["CHECKLIST_ASYNC_DB"] = "1" if args.async_db else "0"
+    os.environ.pop("SLOW_REQUEST_MS", None)
+    # All requests come from one client, which the rate limits would throttle
+    os.environ["ADMISSION_ENABLED"] = "0"
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "async_db": args.async_db,
+        "shape": {"checklists": args.checklists, "categories": args.categories,
+                  "items": args.items, "uploads": args.uploads},
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": {},
+    }
+    targets = TARGETS if args.target == "both" else (args.target,)
+    # uvicorn first: the in-process run imports the app, which changes this process's cwd and settings
+    for target in sorted(targets, reverse=True):
+        with tempfile.TemporaryDirectory() as workdir:
+            run = run_uvicorn if target == "uvicorn" else run_inprocess
+            report["results"][target] = run(args, workdir)
+            os.chdir(BACKEND_DIR)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
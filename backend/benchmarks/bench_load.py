@@ -0,0 +1,118 @@
+"""Load benchmark: sync (threadpool) vs async database mode under concurrency.
+
+Starts uvicorn once per mode against a fresh SQLite database, seeds a few
+checklists and fires concurrent reads and uploads. Run from the backend
+directory (needs httpx, aiosqlite and greenlet):
+
+    python -m benchmarks.bench_load --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def drive(base_url: str, requests: int, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_up(client)
+        checklist = (await client.post("/checklists/", json={
+            "title": "Load test",
+            "categories": [
+                {"name": f"Category {c}", "items": [
+                    {"name": f"Item {c}.{i}", "allow_multiple_files": True} for i in range(10)
+                ]}
+                for c in range(10)
+            ]
+        })).json()
+        item_id = checklist["categories"][0]["items"][0]["id"]
+        urls = [f"/checklists/{checklist['id']}", f"/checklists/public/{checklist['public_link']}"]
+
+        latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(n: int):
+            async with semaphore:
+                start = time.perf_counter()
+                if n % 10 == 0:
+                    response = await client.post(
+                        f"/items/{item_id}/uploads/",
+                        files={"file": (f"load-{n}.txt", os.urandom(64 * 1024))}
+                    )
+                else:
+                    response = await client.get(urls[n % 2])
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "req_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def run_mode(async_db: bool, requests: int, concurrency: int):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR, CHECKLIST_ASYNC_DB="1" if async_db else "0",
+                   ADMISSION_ENABLED="0")  # One client, which the rate limits would throttle
+        # A long keep-alive so queued requests never race an idle-connection close
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+             "--log-level", "warning", "--timeout-keep-alive", "60"],
+            cwd=workdir, env=env
+        )
+        try:
+            return asyncio.run(drive(f"http://127.0.0.1:{port}", requests, concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "sync": run_mode(False, args.requests, args.concurrency),
+        "async": run_mode(True, args.requests, args.concurrency),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Middleware benchmark: requests/sec through the permission middleware.
+
+Compares no middleware, the previous BaseHTTPMiddleware implementation and the
+current pure-ASGI SharedChecklistMiddleware on read requests, driven in-process
+through httpx's ASGI transport. Run from the backend directory:
+
+    python -m benchmarks.bench_middleware --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware import SharedChecklistMiddleware
+
+
+class LegacySharedChecklistMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation this benchmark compares against"""
+
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        method = request.method
+        if "checklists/public/" in path:
+            if method == "GET":
+                return await call_next(request)
+            if method == "POST" and "uploads" in path:
+                return await call_next(request)
+            return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "forbidden"})
+        if method in ["PUT", "DELETE"] or (method == "POST" and "uploads" not in path):
+            if path == "/checklists/" and method == "POST" or "clone" in path:
+                return await call_next(request)
+            if "checklists/edit/" in path:
+                return await call_next(request)
+            if "edit_token" not in request.query_params:
+                return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "forbidden"})
+        return await call_next(request)
+
+
+def make_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/checklists/public/{public_link}")
+    async def public_view(public_link: str):
+        return {"public_link": public_link, "categories": []}
+
+    @app.get("/items/{item_id}/uploads/")
+    async def uploads(item_id: int):
+        return []
+
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+async def requests_per_second(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        urls = ["/checklists/public/abc", "/items/1/uploads/"]
+        for url in urls:
+            await client.get(url)
+        start = time.perf_counter()
+        for n in range(requests):
+            response = await client.get(urls[n % 2])
+            response.raise_for_status()
+        return round(requests / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, middleware in (
+        ("none", None),
+        ("base_http_middleware", LegacySharedChecklistMiddleware),
+        ("pure_asgi", SharedChecklistMiddleware),
+    ):
+        results[name] = asyncio.run(requests_per_second(make_app(middleware), args.requests))
+    print(json.dumps({"requests": args.requests, "req_per_s": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Serialization microbenchmark: ORM + Pydantic response_model vs row dicts + orjson.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_serialization --categories 20 --items 100 --uploads 2
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, database, models, schemas, serializers
+
+
+def seed(db, categories: int, items: int, uploads: int) -> int:
+    """Insert one synthetic checklist of the requested shape, returning its id"""
+    checklist = crud.create_checklist(db, schemas.ChecklistCreate(
+        title="Serialization benchmark",
+        categories=[
+            schemas.CategoryCreate(
+                name=f"Category {c}",
+                items=[schemas.ItemCreate(name=f"Item {c}.{i}", allow_multiple_files=True) for i in range(items)]
+            )
+            for c in range(categories)
+        ]
+    ))
+    item_ids = [item.id for category in checklist.categories for item in category.items]
+    if uploads:
+        db.execute(insert(models.FileUpload), [
+            {"filename": f"evidence-{n}.pdf", "uploaded_at": datetime.utcnow(), "uploader": "bench", "item_id": item_id}
+            for item_id in item_ids for n in range(uploads)
+        ])
+        db.commit()
+    return checklist.id
+
+
+def pydantic_path(db, checklist_id: int) -> bytes:
+    """What a response_model=schemas.Checklist endpoint does with an ORM tree"""
+    db_checklist = crud.get_checklist(db, checklist_id)
+    return schemas.Checklist.model_validate(db_checklist, from_attributes=True).model_dump_json().encode()
+
+
+def orjson_path(db, checklist_id: int) -> bytes:
+    """What the checklist read endpoints do now"""
+    return serializers.dumps(crud.get_checklist_tree(db, checklist_id))
+
+
+def per_request_ms(Session, fn, checklist_id: int, repeat: int):
+    times = []
+    for _ in range(repeat):
+        with Session() as db:
+            start = time.perf_counter()
+            fn(db, checklist_id)
+            times.append(time.perf_counter() - start)
+    times.sort()
+    return {"median_ms": round(times[len(times) // 2] * 1000, 2), "min_ms": round(times[0] * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--uploads", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = database.create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with Session() as db:
+            checklist_id = seed(db, args.categories, args.items, args.uploads)
+
+        with Session() as db:
+            assert json.loads(pydantic_path(db, checklist_id)) == json.loads(orjson_path(db, checklist_id))
+        results = {
+            "pydantic_response_model": per_request_ms(Session, pydantic_path, checklist_id, args.repeat),
+            "row_dicts_orjson": per_request_ms(Session, orjson_path, checklist_id, args.repeat),
+        }
+        engine.dispose()
+
+    print(json.dumps({
+        "shape": {"categories": args.categories, "items": args.items, "uploads_per_item": args.uploads},
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
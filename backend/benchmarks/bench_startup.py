@@ -0,0 +1,131 @@
+"""Startup benchmark: time from launching the server to its first response.
+
+Measures the production entry point (python -m app) on a fresh database,
+which has to be migrated, and on an existing one, as when a worker is
+recycled, with one worker and with several racing to start together; plus
+the cost of importing the app. Each case runs --repeat times in a temporary
+directory. Run from the backend directory:
+
+    python -m benchmarks.bench_startup --repeat 5 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_api import git_commit
+from benchmarks.bench_load import BACKEND_DIR, free_port
+
+POLL_SECONDS = 0.005
+
+
+def environment(workdir: str) -> dict:
+    return dict(os.environ, PYTHONPATH=BACKEND_DIR,
+                DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'checklist.db')}")
+
+
+async def first_response(port: int, server: subprocess.Popen, timeout: float = 60):
+    """Poll / until it answers, failing early if the server exits"""
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            try:
+                (await client.get("/")).raise_for_status()
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(POLL_SECONDS)
+    raise RuntimeError("server did not start")
+
+
+def time_server(workdir: str, workers: int) -> float:
+    """Seconds from launching the server to its first successful response"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=environment(workdir)
+    )
+    try:
+        asyncio.run(first_response(port, server))
+        return time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def time_import(workdir: str) -> float:
+    """Seconds for a fresh interpreter to import the app, interpreter start-up excluded"""
+    code = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=environment(workdir),
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def run_case(name: str, repeat: int, workers: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp()
+        try:
+            if name == "import":
+                samples.append(time_import(workdir))
+                continue
+            if name.startswith("existing"):
+                # Start once, untimed, to create and migrate the database
+                time_server(workdir, 1)
+            samples.append(time_server(workdir, workers if name.endswith("workers") else 1))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return summarize(samples)
+
+
+CASES = ("import", "fresh", "existing", "fresh_workers", "existing_workers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="Workers for the *_workers cases")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    cases = [name.strip() for name in args.cases.split(",") if name.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "workers": args.workers,
+        "results": {name: run_case(name, args.repeat, args.workers) for name in cases},
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
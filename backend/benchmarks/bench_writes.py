@@ -0,0 +1,72 @@
+"""Write-path benchmark: create, replace and clone large checklist templates.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_writes --categories 20 --items 50 --repeat 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, database, models, schemas
+
+
+def make_template(categories: int, items: int, title: str = "Benchmark template"):
+    """Build a ChecklistCreate payload of the requested shape"""
+    return schemas.ChecklistCreate(
+        title=title,
+        description="Synthetic checklist",
+        categories=[
+            schemas.CategoryCreate(
+                name=f"Category {c}",
+                items=[schemas.ItemCreate(name=f"Item {c}.{i}") for i in range(items)]
+            )
+            for c in range(categories)
+        ]
+    )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A file-backed database, tuned like the app's, so commits pay the real fsync cost
+        engine = database.create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        template = make_template(args.categories, args.items)
+
+        results = {"create": [], "update": [], "clone": []}
+        with Session() as db:
+            for _ in range(args.repeat):
+                created = []
+                results["create"].append(timed(lambda: created.append(crud.create_checklist(db, template))))
+                checklist_id = created[0].id
+                update = schemas.ChecklistUpdate(**template.dict())
+                results["update"].append(timed(lambda: crud.update_checklist(db, checklist_id, update)))
+                results["clone"].append(timed(lambda: crud.clone_checklist(db, checklist_id)))
+        engine.dispose()
+
+    print(json.dumps({
+        "shape": {"categories": args.categories, "items": args.items},
+        "repeat": args.repeat,
+        "median_ms": {op: round(sorted(times)[len(times) // 2] * 1000, 2) for op, times in results.items()},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# Settings are read when the app is imported, so point it at a scratch
+# database and working directory first. Run from the backend directory:
+#
+#     python -m pytest -q
+#     CHECKLIST_ASYNC_DB=1 python -m pytest -q   # the same tests on the async engine
+WORKDIR = tempfile.mkdtemp(prefix="checklist-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'checklist.db')}"
+os.environ["JOB_WORKERS"] = "0"  # Process uploads in-process, without a process pool
+os.environ["ADMISSION_ENABLED"] = "0"
+os.environ["STARTUP_WARM_CHECKLISTS"] = "0"
+os.chdir(WORKDIR)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import cache, jobs, models  # noqa: E402
+from app.database import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Entering the client runs the lifespan: migrations, warm-up and the job queue
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def wait_for_jobs(client):
+    """Block until the job queue has processed every queued upload"""
+    return lambda: client.portal.call(jobs.queue.join)
+
+
+@pytest.fixture(autouse=True)
+def clean_database(client):
+    """Give every test an empty database and cache"""
+    yield
+    client.portal.call(jobs.queue.join)
+    with engine.begin() as connection:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    cache.public_checklists.clear()
+
+
+@pytest.fixture
+def db(client):
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager collecting the SQL statements run inside it, on either engine"""
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        for target in engines:
+            event.listen(target, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", record)
+
+    return counting
+
+
+def template(categories: int, items: int, title: str = "Checklist") -> dict:
+    """A ChecklistCreate payload with `categories` categories of `items` items each"""
+    return {
+        "title": title,
+        "description": "Test checklist",
+        "categories": [
+            {"name": f"Category {c}", "items": [
+                {"name": f"Item {c}.{i}", "allow_multiple_files": True} for i in range(items)
+            ]}
+            for c in range(categories)
+        ],
+    }
+
+
+@pytest.fixture
+def make_checklist(client):
+    """Create a checklist through the API and return its JSON"""
+
+    def make(categories: int = 1, items: int = 1, title: str = "Checklist") -> dict:
+        response = client.post("/checklists/", json=template(categories, items, title))
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return make
@@ -0,0 +1,40 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admission, config, metrics
+from app.main import create_app
+
+ORIGIN = "http://frontend.example"
+
+
+@pytest.fixture
+def throttled_client(client, monkeypatch):
+    """A client of an app with admission control allowing one public read per client"""
+    monkeypatch.setattr(config, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(config, "PUBLIC_CLIENT_RATE", 1)
+    monkeypatch.setattr(config, "PUBLIC_CLIENT_BURST", 1)
+    monkeypatch.setattr(admission, "controller", admission.Admission())
+    # The database is already prepared by the session's client, so the lifespan is not needed
+    return TestClient(create_app())
+
+
+def test_throttled_cross_origin_request_carries_cors_headers(throttled_client, make_checklist):
+    url = f"/checklists/public/{make_checklist()['public_link']}"
+    assert throttled_client.get(url, headers={"Origin": ORIGIN}).status_code == 200
+
+    response = throttled_client.get(url, headers={"Origin": ORIGIN})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+    assert "retry-after" in response.headers["access-control-expose-headers"].lower()
+
+
+def test_throttled_requests_are_counted_against_their_route(throttled_client, make_checklist):
+    url = f"/checklists/public/{make_checklist()['public_link']}"
+    labels = ("GET", "/checklists/public/{public_link}", "429")
+    before = metrics.requests_total._values.get(labels, 0)
+    throttled_client.get(url)
+    assert throttled_client.get(url).status_code == 429
+    assert metrics.requests_total._values[labels] == before + 1
+    assert throttled_client.get("/no/such/route").status_code == 404
+    assert metrics.requests_total._values[("GET", "unmatched", "404")] >= 1
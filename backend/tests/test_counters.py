@@ -0,0 +1,36 @@
+from app import crud
+
+COUNTERS = ("category_count", "item_count", "completed_item_count", "upload_count", "upload_bytes")
+
+
+def counts(client, checklist_id):
+    checklist = client.get(f"/checklists/{checklist_id}").json()
+    return {name: checklist[name] for name in COUNTERS}
+
+
+def test_counters_follow_every_kind_of_change(client, make_checklist, db):
+    checklist = make_checklist(categories=2, items=2)
+    token = {"edit_token": checklist["edit_token"]}
+    first, second = checklist["categories"]
+    item_id = first["items"][0]["id"]
+    assert counts(client, checklist["id"]) == {
+        "category_count": 2, "item_count": 4, "completed_item_count": 0, "upload_count": 0, "upload_bytes": 0
+    }
+
+    uploads = [
+        client.post(f"/items/{item_id}/uploads/", params=token, files={"file": (f"{n}.txt", b"x" * (n + 1))}).json()
+        for n in range(2)
+    ]
+    assert counts(client, checklist["id"]) == {
+        "category_count": 2, "item_count": 4, "completed_item_count": 1, "upload_count": 2, "upload_bytes": 3
+    }
+    category = client.get(f"/checklists/{checklist['id']}").json()["categories"][0]
+    assert (category["item_count"], category["completed_item_count"], category["upload_bytes"]) == (2, 1, 3)
+
+    client.delete(f"/uploads/{uploads[0]['id']}", params=token)
+    client.post(f"/categories/{second['id']}/items/", params=token, json={"name": "Extra"})
+    client.delete(f"/categories/{first['id']}", params=token)
+    assert counts(client, checklist["id"]) == {
+        "category_count": 1, "item_count": 3, "completed_item_count": 0, "upload_count": 0, "upload_bytes": 0
+    }
+    assert crud.reconcile_counters(db) == []
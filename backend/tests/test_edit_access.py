@@ -0,0 +1,18 @@
+import pytest
+
+from app import crud
+
+
+@pytest.mark.parametrize("kind", ["checklist", "category", "item", "upload"])
+def test_edit_access_follows_each_resource_to_its_checklist(client, make_checklist, db, kind):
+    mine, other = make_checklist(), make_checklist()
+    item_id = mine["categories"][0]["items"][0]["id"]
+    upload = client.post(f"/items/{item_id}/uploads/", files={"file": ("notes.txt", b"text")}).json()
+    resource_id = {
+        "checklist": mine["id"], "category": mine["categories"][0]["id"], "item": item_id, "upload": upload["id"]
+    }[kind]
+
+    assert crud.get_owning_checklist_id(db, kind, resource_id) == mine["id"]
+    assert crud.get_edit_access(db, mine["edit_token"], kind, resource_id) is True
+    assert crud.get_edit_access(db, other["edit_token"], kind, resource_id) is False
+    assert crud.get_edit_access(db, mine["edit_token"], kind, 10 ** 6) is None
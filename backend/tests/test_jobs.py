@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app import crud, models
+
+LEASE = 600
+
+
+def pending_upload(client, make_checklist, db, wait_for_jobs):
+    """An upload set back to pending once the job queue is done with it"""
+    checklist = make_checklist()
+    item_id = checklist["categories"][0]["items"][0]["id"]
+    upload = client.post(f"/items/{item_id}/uploads/", params={"edit_token": checklist["edit_token"]},
+                         files={"file": ("notes.txt", b"some text")}).json()
+    wait_for_jobs()
+    db.execute(update(models.FileUpload).values(processing_status="pending", processing_started_at=None))
+    db.commit()
+    return upload["id"]
+
+
+def test_an_upload_is_claimed_once(client, make_checklist, db, wait_for_jobs):
+    file_id = pending_upload(client, make_checklist, db, wait_for_jobs)
+    assert crud.start_upload_processing(db, file_id, LEASE).id == file_id
+    assert crud.start_upload_processing(db, file_id, LEASE) is None
+    assert crud.get_unprocessed_upload_ids(db, LEASE) == []
+
+
+def test_an_abandoned_upload_is_claimed_again_once_its_lease_runs_out(client, make_checklist, db, wait_for_jobs):
+    file_id = pending_upload(client, make_checklist, db, wait_for_jobs)
+    crud.start_upload_processing(db, file_id, LEASE)
+    db.execute(update(models.FileUpload).values(processing_started_at=datetime.utcnow() - timedelta(seconds=LEASE + 1)))
+    db.commit()
+
+    assert crud.get_unprocessed_upload_ids(db, LEASE, include_pending=False) == [file_id]
+    assert crud.start_upload_processing(db, file_id, LEASE).id == file_id
+    assert crud.start_upload_processing(db, file_id, LEASE) is None
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import admission, metrics
+from app.database import engine
+
+
+def metric_types(exposition):
+    return dict(line.split()[2:4] for line in exposition.splitlines() if line.startswith("# TYPE "))
+
+
+def test_counts_read_from_elsewhere_are_exposed_as_counters(client, monkeypatch):
+    monkeypatch.setitem(admission.controller.rejected, "public_client_rate", 3)
+    exposition = client.get("/metrics").text
+    types = metric_types(exposition)
+    assert types["admission_rejected_total"] == "counter"
+    assert types["admission_uploads_queued_total"] == "counter"
+    assert types["event_stream_overflows_total"] == "counter"
+    assert types["event_stream_subscribers"] == "gauge"
+    assert types["uploads_in_flight"] == "gauge"
+    assert 'admission_rejected_total{reason="public_client_rate"} 3' in exposition
+
+
+def test_a_failed_statement_is_not_timed_into_the_next_one(client):
+    stats = metrics.RequestStats(keep_statements=True)
+    token = metrics.current_request.set(stats)
+    observed = sum(metrics.query_duration._values.get((), [[]])[0])
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+            # A start time left over from the failure would add this pause to the next statement
+            time.sleep(0.2)
+            connection.execute(text("SELECT 1"))
+    finally:
+        metrics.current_request.reset(token)
+    assert sum(metrics.query_duration._values[()][0]) == observed + 1
+    assert stats.queries == 1
+    assert [statement for _, statement in stats.statements] == ["SELECT 1"]
+    assert 0 <= stats.db_seconds < 0.1
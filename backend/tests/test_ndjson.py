@@ -0,0 +1,30 @@
+import json
+
+from tests.conftest import template
+
+
+def export(client):
+    response = client.get("/checklists/export.ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_export_then_import_recreates_the_same_templates(client, make_checklist):
+    make_checklist(categories=2, items=3, title="Première")
+    make_checklist(categories=0, title="Empty")
+    exported = export(client)
+    assert [document["title"] for document in exported] == ["Première", "Empty"]
+
+    body = "\n".join(json.dumps(document, ensure_ascii=False) for document in exported) + "\n"
+    result = client.post("/checklists/import", content=body.encode()).json()
+    assert result["errors"] == []
+    assert [created["line"] for created in result["created"]] == [1, 2]
+    assert export(client) == exported * 2
+
+
+def test_import_reports_bad_lines_and_keeps_the_rest(client):
+    lines = [json.dumps(template(1, 1, "Good")), "{not json", json.dumps({"categories": []}), ""]
+    result = client.post("/checklists/import", content="\n".join(lines).encode()).json()
+    assert [created["line"] for created in result["created"]] == [1]
+    assert [error["line"] for error in result["errors"]] == [2, 3]
@@ -0,0 +1,31 @@
+from app import cache
+
+
+def test_reused_id_is_not_served_a_deleted_checklists_cached_view(client, make_checklist):
+    first = make_checklist(title="Secret A")
+    response = client.get(f"/checklists/public/{first['public_link']}")
+    assert response.json()["title"] == "Secret A"
+    etag = response.headers["etag"]
+
+    assert client.delete(f"/checklists/{first['id']}", params={"edit_token": first["edit_token"]}).status_code == 204
+    assert cache.public_checklists.stats()["entries"] == 0
+    second = make_checklist(title="B")
+    assert second["id"] == first["id"]  # SQLite hands out the deleted id again
+
+    response = client.get(f"/checklists/public/{second['public_link']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "B"
+    assert response.json()["edit_token"] == second["edit_token"]
+    assert response.headers["etag"] != etag
+
+
+def test_public_view_is_cached_per_version(client, make_checklist):
+    checklist = make_checklist()
+    url = f"/checklists/public/{checklist['public_link']}"
+    first = client.get(url)
+    assert client.get(url, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    client.put(f"/checklists/{checklist['id']}", params={"edit_token": checklist["edit_token"]},
+               json={"title": "Renamed"})
+    second = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200 and second.json()["title"] == "Renamed"
@@ -0,0 +1,40 @@
+from app import crud
+
+
+def _upload_everywhere(client, checklist):
+    for category in checklist["categories"]:
+        for item in category["items"]:
+            response = client.post(f"/items/{item['id']}/uploads/", files={"file": (f"{item['id']}.txt", b"data")})
+            assert response.status_code == 201, response.text
+
+
+def test_get_checklist_query_count_does_not_grow_with_tree(client, db, make_checklist, count_queries, wait_for_jobs):
+    small, large = make_checklist(1, 1), make_checklist(10, 10)
+    _upload_everywhere(client, small)
+    _upload_everywhere(client, large)
+    wait_for_jobs()
+
+    counts = []
+    for checklist in (small, large):
+        db.expunge_all()
+        with count_queries() as statements:
+            loaded = crud.get_checklist(db, checklist["id"])
+            # Touch every level, as serializing does
+            assert sum(len(item.uploads) for category in loaded.categories for item in category.items) > 0
+        counts.append(len(statements))
+    assert counts[0] == counts[1] > 0
+
+
+def test_public_view_query_count_does_not_grow_with_tree(client, make_checklist, count_queries, wait_for_jobs):
+    small, large = make_checklist(1, 1), make_checklist(10, 10)
+    _upload_everywhere(client, small)
+    _upload_everywhere(client, large)
+    wait_for_jobs()
+
+    counts = []
+    for checklist in (small, large):
+        with count_queries() as statements:
+            response = client.get(f"/checklists/public/{checklist['public_link']}")
+        assert response.status_code == 200
+        counts.append(len(statements))
+    assert counts[0] == counts[1] > 0
@@ -0,0 +1,28 @@
+def pages(client, limit):
+    """Every page of checklist summaries, following next_cursor"""
+    params = {"limit": limit}
+    while True:
+        page = client.get("/checklists/summary", params=params).json()
+        yield page["items"]
+        if page["next_cursor"] is None:
+            return
+        params["cursor"] = page["next_cursor"]
+
+
+def test_cursor_pages_cover_every_checklist_once_newest_first(client, make_checklist):
+    created = [make_checklist(title=f"Checklist {n}")["id"] for n in range(5)]
+    seen = [summary["id"] for page in pages(client, limit=2) for summary in page]
+    assert seen == created[::-1]
+
+
+def test_checklists_created_while_paging_do_not_shift_later_pages(client, make_checklist):
+    created = [make_checklist(title=f"Checklist {n}")["id"] for n in range(4)]
+    walk = pages(client, limit=2)
+    first = [summary["id"] for summary in next(walk)]
+    make_checklist(title="Newer")
+    rest = [summary["id"] for page in walk for summary in page]
+    assert first + rest == created[::-1]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/checklists/summary", params={"cursor": "not a cursor"}).status_code == 400
@@ -0,0 +1,27 @@
+def test_update_keeps_submitted_ids_and_their_uploads(client, make_checklist):
+    checklist = make_checklist(categories=2, items=2)
+    first, second = checklist["categories"]
+    kept, dropped = first["items"]
+    upload = client.post(f"/items/{kept['id']}/uploads/", params={"edit_token": checklist["edit_token"]},
+                         files={"file": ("notes.txt", b"kept")}).json()
+
+    response = client.put(f"/checklists/{checklist['id']}", params={"edit_token": checklist["edit_token"]}, json={
+        "title": "Renamed",
+        "categories": [
+            {"id": second["id"], "name": "Moved into", "items": [
+                {"id": kept["id"], "name": "Renamed item", "allow_multiple_files": True},
+                {"name": "New item", "allow_multiple_files": False},
+            ]},
+        ],
+    })
+    assert response.status_code == 200, response.text
+
+    body = response.json()
+    assert body["title"] == "Renamed"
+    [category] = body["categories"]
+    assert category["id"] == second["id"] and category["name"] == "Moved into"
+    moved, new = category["items"]
+    assert moved["id"] == kept["id"] and moved["name"] == "Renamed item"
+    assert [u["id"] for u in moved["uploads"]] == [upload["id"]]
+    assert new["id"] not in {kept["id"], dropped["id"]} and new["uploads"] == []
+    assert client.get(f"/uploads/{upload['id']}/content").content == b"kept"
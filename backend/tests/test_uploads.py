@@ -0,0 +1,141 @@
+import io
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import crud, models, schemas, storage
+from app.api import files
+
+
+def upload(client, checklist, item_id, content=b"same content", filename="notes.txt"):
+    response = client.post(f"/items/{item_id}/uploads/", params={"edit_token": checklist["edit_token"]},
+                           files={"file": (filename, content)})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def stored_files():
+    """Paths of every file in the upload directory, staged ones included"""
+    return {os.path.join(root, name) for root, _, names in os.walk(storage.UPLOAD_DIR) for name in names}
+
+
+def test_reupload_after_delete_stores_the_content_again(client, make_checklist, wait_for_jobs):
+    checklist = make_checklist()
+    item_id = checklist["categories"][0]["items"][0]["id"]
+    first = upload(client, checklist, item_id)
+    assert client.delete(f"/uploads/{first['id']}", params={"edit_token": checklist["edit_token"]}).status_code == 204
+    assert not os.path.exists(storage.blob_path(first["sha256"]))
+
+    second = upload(client, checklist, item_id)
+    wait_for_jobs()
+    assert client.get(f"/uploads/{second['id']}/content").content == b"same content"
+
+
+def test_upload_taking_a_blob_before_its_purge_keeps_the_file(client, make_checklist, db, wait_for_jobs):
+    checklist = make_checklist()
+    item_id = checklist["categories"][0]["items"][0]["id"]
+    first = upload(client, checklist, item_id)
+    wait_for_jobs()
+    # The delete has committed but its background purge has not run yet
+    orphans = crud.delete_file_upload(db, first["id"])
+    assert orphans.digests == [first["sha256"]]
+
+    second = upload(client, checklist, item_id)
+    assert crud.purge_blobs(db, orphans.digests) == []
+    assert db.get(models.Blob, first["sha256"]).ref_count == 1
+    assert client.get(f"/uploads/{second['id']}/content").content == b"same content"
+
+
+def test_upload_to_an_item_deleted_meanwhile_is_not_found_and_leaves_no_file(client, make_checklist, monkeypatch):
+    checklist = make_checklist()
+    item_id = checklist["categories"][0]["items"][0]["id"]
+    before = stored_files()
+    get_item = files.async_crud.get_item
+
+    async def deleted_after_lookup(db, item_id):
+        found = await get_item(db, item_id=item_id)
+        await files.async_crud.delete_item(db, item_id=item_id)
+        return found
+
+    # The item passes the route's checks and is gone by the time its upload is recorded
+    monkeypatch.setattr(files.async_crud, "get_item", deleted_after_lookup)
+    response = client.post(f"/items/{item_id}/uploads/", params={"edit_token": checklist["edit_token"]},
+                           files={"file": ("notes.txt", b"never stored")})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Item not found"
+    assert stored_files() == before
+
+
+def test_batch_upload_records_the_files_of_items_that_still_exist(client, make_checklist, monkeypatch):
+    checklist = make_checklist(items=2)
+    kept, deleted = (item["id"] for item in checklist["categories"][0]["items"])
+    before = stored_files()
+    get_upload_targets = files.async_crud.get_upload_targets
+
+    async def deleted_after_lookup(db, item_ids):
+        targets = await get_upload_targets(db, item_ids=item_ids)
+        monkeypatch.setattr(files.async_crud, "get_upload_targets", get_upload_targets)
+        await files.async_crud.delete_item(db, item_id=deleted)
+        return targets
+
+    monkeypatch.setattr(files.async_crud, "get_upload_targets", deleted_after_lookup)
+    response = client.post(
+        f"/checklists/{checklist['id']}/uploads/batch", params={"edit_token": checklist["edit_token"]},
+        data={"item_ids": [str(kept), str(deleted)]},
+        files=[("files", ("kept.txt", b"kept in batch")), ("files", ("gone.txt", b"gone in batch"))]
+    )
+    assert response.status_code == 200, response.text
+    kept_result, deleted_result = response.json()
+    assert kept_result["error"] is None and kept_result["item_id"] == kept
+    assert deleted_result["error"] == "Item not found" and deleted_result["upload"] is None
+    assert stored_files() - before == {storage.blob_path(kept_result["upload"]["sha256"])}
+
+
+def test_files_published_by_a_failed_commit_are_removed(client, make_checklist, db, monkeypatch):
+    checklist = make_checklist()
+    item_id = checklist["categories"][0]["items"][0]["id"]
+    before = stored_files()
+    tmp_path, digest, size = storage.store_stream(io.BytesIO(b"lost in commit"), 1024)
+    commit = db.commit
+
+    def fail_once():
+        monkeypatch.setattr(db, "commit", commit)
+        raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+    monkeypatch.setattr(db, "commit", fail_once)
+    with pytest.raises(OperationalError):
+        crud.create_file_upload(
+            db, schemas.FileUploadCreate(filename="lost.txt", sha256=digest, size=size), item_id,
+            staged={digest: tmp_path}
+        )
+    storage.discard(tmp_path)  # As the upload routes do whatever happened
+    assert stored_files() == before
+    assert db.get(models.Blob, digest) is None
+
+
+def test_update_dropping_an_item_removes_its_files(client, make_checklist, wait_for_jobs):
+    checklist = make_checklist(items=2)
+    category = checklist["categories"][0]
+    kept, dropped = category["items"]
+    uploaded = upload(client, checklist, dropped["id"], content=b"dropped")
+    wait_for_jobs()
+    assert os.path.exists(storage.blob_path(uploaded["sha256"]))
+
+    response = client.put(f"/categories/{category['id']}", params={"edit_token": checklist["edit_token"]},
+                          json={"name": category["name"], "items": [
+                              {"id": kept["id"], "name": kept["name"], "allow_multiple_files": True}
+                          ]})
+    assert response.status_code == 200, response.text
+    assert [item["id"] for item in response.json()["items"]] == [kept["id"]]
+    assert not os.path.exists(storage.blob_path(uploaded["sha256"]))
+
+
+@pytest.mark.parametrize("header", ['"{}"', 'W/"{}"', '"other", "{}"', "*"])
+def test_upload_content_is_not_sent_again_to_a_client_that_has_it(client, make_checklist, header):
+    checklist = make_checklist()
+    uploaded = upload(client, checklist, checklist["categories"][0]["items"][0]["id"])
+    response = client.get(f"/uploads/{uploaded['id']}/content",
+                          headers={"If-None-Match": header.format(uploaded["sha256"])})
+    assert response.status_code == 304
+    assert response.headers["etag"] == f'"{uploaded["sha256"]}"'
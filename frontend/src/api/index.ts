@@ -1,6 +1,6 @@
 // API utility functions for backend endpoints
 import axios from 'axios';
-import { Checklist, Category, Item, FileUpload } from '../types';
+import { Checklist, Category, Item, FileUpload, FileUploadResult, ChecklistSummaryPage } from '../types';
 
 const API_BASE = process.env.REACT_APP_API_URL || 'http://localhost:8001';
 
@@ -9,6 +9,13 @@ export async function getChecklists(): Promise<Checklist[]> {
   return res.data;
 }
 
+export async function getChecklistSummaries(cursor?: string | null): Promise<ChecklistSummaryPage> {
+  const res = await axios.get(`${API_BASE}/checklists/summary`, {
+    params: cursor ? { cursor } : {},
+  });
+  return res.data;
+}
+
 export async function getChecklist(id: number | string): Promise<Checklist> {
   const res = await axios.get(`${API_BASE}/checklists/${id}`);
   return res.data;
@@ -37,6 +44,16 @@ export async function uploadFile(itemId: number, formData: FormData): Promise<Fi
   return res.data;
 }
 
+export async function uploadFiles(itemId: number, formData: FormData): Promise<FileUploadResult[]> {
+  // formData holds any number of `files` entries, plus an optional `uploader`
+  const res = await axios.post(`${API_BASE}/items/${itemId}/uploads/batch`, formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  return res.data;
+}
+
 export async function getItemFiles(itemId: number): Promise<FileUpload[]> {
   const res = await axios.get(`${API_BASE}/items/${itemId}/uploads/`);
   return res.data;
@@ -1,18 +1,21 @@
 import React, { useEffect, useState } from 'react';
-import { getChecklists, cloneChecklist, deleteChecklist } from '../api';
-import { Checklist } from '../types';
+import { getChecklistSummaries, cloneChecklist, deleteChecklist } from '../api';
+import { ChecklistSummary } from '../types';
 
 const ChecklistList: React.FC = () => {
-  const [checklists, setChecklists] = useState<Checklist[]>([]);
+  const [checklists, setChecklists] = useState<ChecklistSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [actionLoading, setActionLoading] = useState<{[id: number]: string}>({});
 
   const loadChecklists = () => {
     setLoading(true);
-    getChecklists()
-      .then(data => {
-        setChecklists(data);
+    getChecklistSummaries()
+      .then(page => {
+        setChecklists(page.items);
+        setNextCursor(page.next_cursor || null);
         setLoading(false);
       })
       .catch(err => {
@@ -21,6 +24,20 @@ const ChecklistList: React.FC = () => {
       });
   };
 
+  const loadMore = () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    getChecklistSummaries(nextCursor)
+      .then(page => {
+        setChecklists(prev => [...prev, ...page.items]);
+        setNextCursor(page.next_cursor || null);
+      })
+      .catch(err => {
+        setError('Failed to load more checklists. Please try again later.');
+      })
+      .finally(() => setLoadingMore(false));
+  };
+
   useEffect(() => {
     loadChecklists();
   }, []);
@@ -168,7 +185,7 @@ const ChecklistList: React.FC = () => {
                 textDecoration: 'none'
               }} 
               className="h-full flex flex-col hover:shadow-xl hover:border-blue-200 no-underline checklist-box">
-              <div style={{ height: '220px', display: 'flex', flexDirection: 'column', overflow: 'hidden' }}>
+              <div style={{ height: '250px', display: 'flex', flexDirection: 'column', overflow: 'hidden' }}>
                 <div className="flex justify-between items-start mb-3">
                   <div className="flex-1 min-w-0">
                     <h2 className="font-semibold text-lg text-primary-700 mb-1 truncate">{cl.title}</h2>
@@ -184,23 +201,33 @@ const ChecklistList: React.FC = () => {
                 
                 <div className="text-sm text-gray-600 mb-2">
                   <div className="flex items-center">
-                    <span>{cl.categories.length || 0} {cl.categories.length === 1 ? 'category' : 'categories'}</span>
+                    <span>{cl.category_count} {cl.category_count === 1 ? 'category' : 'categories'}</span>
                   </div>
                 </div>
                 
-                {cl.categories && cl.categories.length > 0 && (
-                  <div className="mt-3 grid grid-cols-2 gap-2">
-                    {cl.categories.slice(0, 2).map((cat, idx) => (
-                      <div key={idx} className="bg-gray-50 p-2 rounded border border-gray-200 flex items-center overflow-hidden">
-                        <span className="w-3 h-3 mr-1 inline-block bg-primary-100 rounded-full"></span>
-                        <span className="text-xs font-medium truncate no-underline" style={{ textDecoration: 'none' }}>{cat.name}</span>
-                      </div>
-                    ))}
-                    {cl.categories.length > 2 && (
-                      <div className="bg-gray-50 p-2 rounded border border-gray-200 flex items-center justify-center">
-                        <span className="text-xs text-gray-500">+{cl.categories.length - 2} more</span>
-                      </div>
-                    )}
+                <div className="mt-3 grid grid-cols-2 gap-2">
+                  <div className="bg-gray-50 p-2 rounded border border-gray-200 flex items-center overflow-hidden">
+                    <span className="w-3 h-3 mr-1 inline-block bg-primary-100 rounded-full"></span>
+                    <span className="text-xs font-medium truncate">{cl.item_count} {cl.item_count === 1 ? 'item' : 'items'}</span>
+                  </div>
+                  <div className="bg-gray-50 p-2 rounded border border-gray-200 flex items-center overflow-hidden">
+                    <span className="w-3 h-3 mr-1 inline-block bg-primary-100 rounded-full"></span>
+                    <span className="text-xs font-medium truncate">{cl.upload_count} {cl.upload_count === 1 ? 'file' : 'files'}</span>
+                  </div>
+                </div>
+                
+                {cl.item_count > 0 && (
+                  <div className="mt-3">
+                    <div className="flex justify-between text-xs text-gray-600 mb-1">
+                      <span>{cl.completed_item_count} of {cl.item_count} items complete</span>
+                      <span>{Math.round((cl.completed_item_count / cl.item_count) * 100)}%</span>
+                    </div>
+                    <div className="w-full h-2 bg-gray-200 rounded-full overflow-hidden">
+                      <div
+                        className="h-2 bg-primary-600 rounded-full"
+                        style={{ width: `${(cl.completed_item_count / cl.item_count) * 100}%` }}
+                      ></div>
+                    </div>
                   </div>
                 )}
               </div>
@@ -295,6 +322,19 @@ const ChecklistList: React.FC = () => {
           ))}
         </div>
       )}
+      
+      {nextCursor && (
+        <div className="flex justify-center mt-6">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="btn rounded-lg"
+            style={{ padding: '8px 16px', borderRadius: '8px', border: '1px solid #e5e7eb', fontWeight: '500' }}
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -28,10 +28,13 @@ const EditChecklist: React.FC = () => {
         setDescription(data.description || '');
         setEditToken(data.edit_token); // Store the edit token for authorization
         
-        // Convert backend categories to CategoryCreate format
+        // Convert backend categories to CategoryCreate format, keeping ids so
+        // the update only touches what changed and existing uploads survive
         const formattedCategories = data.categories.map((cat: any) => ({
+          id: cat.id,
           name: cat.title || cat.name,
           items: cat.items.map((item: any) => ({
+            id: item.id,
             name: item.title || item.name,
             allow_multiple_files: item.allow_multiple_files
           }))
@@ -20,12 +20,9 @@ const PublicChecklist: React.FC = () => {
   const [itemFiles, setItemFiles] = useState<{[itemId: number]: FileUpload[]}>({});
   const [loadingFiles, setLoadingFiles] = useState<{[itemId: number]: boolean}>({});
 
-  useEffect(() => {
-    if (!publicLink) return;
-    
-    setLoading(true);
+  const loadChecklist = () => {
     // Use the public link endpoint
-    axios.get(`${API_BASE}/checklists/public/${publicLink}`)
+    return axios.get(`${API_BASE}/checklists/public/${publicLink}`)
       .then(response => {
         setChecklist(response.data);
         setLoading(false);
@@ -35,6 +32,71 @@ const PublicChecklist: React.FC = () => {
         setError('Failed to load the shared checklist. The link may be invalid or expired.');
         setLoading(false);
       });
+  };
+
+  useEffect(() => {
+    if (!publicLink) return;
+    
+    setLoading(true);
+    loadChecklist();
+  }, [publicLink]);
+
+  // Live updates from other collaborators, instead of polling
+  useEffect(() => {
+    if (!publicLink || typeof EventSource === 'undefined') return;
+    
+    const source = new EventSource(`${API_BASE}/checklists/public/${publicLink}/events`);
+    const data = (event: Event) => JSON.parse((event as MessageEvent).data);
+    
+    source.addEventListener('upload_added', event => {
+      const { item_id, upload } = data(event);
+      setItemFiles(prev => {
+        // Items whose files are not shown yet load them when opened
+        if (!prev[item_id] || prev[item_id].some(file => file.id === upload.id)) return prev;
+        return { ...prev, [item_id]: [...prev[item_id], upload] };
+      });
+    });
+    source.addEventListener('upload_removed', event => {
+      const { item_id, upload_id } = data(event);
+      setItemFiles(prev => {
+        if (!prev[item_id]) return prev;
+        return { ...prev, [item_id]: prev[item_id].filter(file => file.id !== upload_id) };
+      });
+    });
+    source.addEventListener('upload_processed', event => {
+      const { item_id, upload_id, processing_status, has_thumbnail } = data(event);
+      setItemFiles(prev => {
+        if (!prev[item_id]) return prev;
+        return {
+          ...prev,
+          [item_id]: prev[item_id].map(file =>
+            file.id === upload_id ? { ...file, processing_status, has_thumbnail } : file
+          )
+        };
+      });
+    });
+    source.addEventListener('item_updated', event => {
+      const { item_id, name, allow_multiple_files } = data(event);
+      setChecklist(prev => prev && {
+        ...prev,
+        categories: prev.categories.map(category => ({
+          ...category,
+          items: category.items.map(item =>
+            item.id === item_id ? { ...item, name, allow_multiple_files } : item
+          )
+        }))
+      });
+    });
+    // Structural changes, or events missed while falling behind: re-fetch
+    ['item_added', 'item_removed', 'checklist_changed', 'resync'].forEach(type =>
+      source.addEventListener(type, () => { loadChecklist(); })
+    );
+    source.addEventListener('checklist_deleted', () => {
+      source.close();
+      setError('This checklist has been deleted.');
+    });
+    
+    return () => source.close();
   }, [publicLink]);
 
   const loadItemFiles = async (itemId: number) => {
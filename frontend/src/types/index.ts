@@ -6,9 +6,19 @@ export interface FileUpload {
   uploader?: string;
   item_id: number;
   created_at: string;
+  processing_status?: 'pending' | 'processing' | 'done' | 'failed';
+  has_thumbnail?: boolean; // PDF first page preview at /uploads/{id}/thumbnail
+}
+
+export interface FileUploadResult {
+  filename: string;
+  item_id: number;
+  upload?: FileUpload; // Set when the file was stored
+  error?: string; // Why the file was rejected
 }
 
 export interface ItemCreate {
+  id?: number; // Existing item, updated in place so its uploads are kept
   name: string;
   allow_multiple_files?: boolean;
   temp_id?: number; // Temporary ID for tracking files during creation
@@ -26,6 +36,7 @@ export interface Item {
 }
 
 export interface CategoryCreate {
+  id?: number; // Existing category, updated in place
   name: string;
   items?: ItemCreate[];
 }
@@ -46,3 +57,22 @@ export interface Checklist {
   edit_token: string;
   categories: Category[];
 }
+
+export interface ChecklistSummary {
+  id: number;
+  title: string;
+  description?: string;
+  public_link: string;
+  edit_token: string;
+  created_at: string;
+  category_count: number;
+  item_count: number;
+  completed_item_count: number; // Items with at least one upload
+  upload_count: number;
+  upload_bytes: number;
+}
+
+export interface ChecklistSummaryPage {
+  items: ChecklistSummary[];
+  next_cursor?: string | null;
+}